@@ -31,27 +31,70 @@ USAGE:
 """
 
 import argparse
+import asyncio
+import functools
 import json
 import os
 import re
 import sys
-import time
+import threading
 from pathlib import Path
-from http.cookies import SimpleCookie
-from urllib.parse import urljoin
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
 try:
-    from curl_cffi import requests
-    from curl_cffi.requests import Cookies
+    from curl_cffi import CurlHttpVersion
+    from curl_cffi.requests import AsyncSession, Cookies
     USE_CURL_CFFI = True
 except ImportError:
-    import requests as std_requests
     USE_CURL_CFFI = False
-    print("Warning: curl_cffi not installed. Using standard requests.")
+    try:
+        import httpx
+    except ImportError:
+        print("Install an HTTP client first:")
+        print("  pip install curl_cffi        (recommended)")
+        print("  pip install 'httpx[http2]'   (fallback)")
+        sys.exit(1)
+    print("Warning: curl_cffi not installed. Using httpx.")
     print("If you get blocked, install it: pip install curl_cffi")
 
+# httpx only speaks HTTP/2 with the h2 package; without it we stay on HTTP/1.1
+try:
+    import h2  # noqa: F401
+    USE_HTTP2 = True
+except ImportError:
+    USE_HTTP2 = False
+
+try:
+    import orjson
+    USE_ORJSON = True
+except ImportError:
+    USE_ORJSON = False
+
 BASE_URL = "https://ideogram.ai"
 BROWSER_VERSION = "edge101"
+DOWNLOAD_CONCURRENCY = 8
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled on each attempt
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRY_AFTER = 60  # never sleep longer than this on a server's say-so
+PROBE_CONCURRENCY = 4
+PAGE_PREFETCH = 8  # listing pages requested in parallel; lower it if you see 429s
+DIRECT_BATCH_URL = f"{BASE_URL}/api/images/direct_batch"
+DIRECT_BATCH_SIZE = 50
+CHUNK_SIZE = 64 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024  # coalesces 16 network chunks per write()
+MANIFEST_NAME = "manifest.jsonl"  # one {"id", "file"} line per finished download
+
+# Leading bytes of each image format we save (WebP is RIFF....WEBP, checked separately)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF8", "gif"),
+)
+
+# Filename sanitising, compiled once rather than per image
+UNSAFE_CHARS_RE = re.compile(r'[^\w\s-]')
+WHITESPACE_RE = re.compile(r'\s+')
 
 HEADERS = {
     "Origin": BASE_URL,
@@ -66,46 +109,221 @@ HEADERS = {
 }
 
 
+@functools.lru_cache(maxsize=4)
 def parse_cookie_string(cookie_string):
-    """Parse a cookie string into a dict."""
-    cookie = SimpleCookie()
-    cookie.load(cookie_string)
-    return {key: morsel.value for key, morsel in cookie.items()}
+    """Parse a Cookie header string ("a=1; b=2") into a dict. Don't mutate the result, it's cached."""
+    cookies = {}
+    for pair in cookie_string.split(";"):
+        name, sep, value = pair.partition("=")
+        if sep:
+            cookies[name.strip()] = value.strip()
+    return cookies
+
+
+def retry_after(resp):
+    """Seconds the server asked us to wait via Retry-After, or None if it didn't say."""
+    try:
+        return min(float(resp.headers.get("retry-after", "")), MAX_RETRY_AFTER)
+    except ValueError:
+        return None  # absent, or an HTTP date we don't bother parsing
+
+
+def set_query_param(url, key, value):
+    """Return `url` with query parameter `key` set to `value`."""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query[key] = str(value)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+IMAGE_KEYS = frozenset(["response_id", "image_url", "url", "thumbnail", "thumbnail_url", "prompt"])
+
+
+def has_image_keys(data):
+    """Whether any dict in `data` has an image-like key (lists are sampled, not walked in full)."""
+    if isinstance(data, dict):
+        return any(k in IMAGE_KEYS for k in data) or any(has_image_keys(v) for v in data.values())
+    if isinstance(data, list):
+        return any(has_image_keys(item) for item in data[:5])
+    return False
+
+
+def load_json(content):
+    """Parse a JSON response body (bytes), using orjson when it's installed."""
+    if USE_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dump_json(obj):
+    """Serialise `obj` to indented JSON bytes, using orjson when it's installed."""
+    if USE_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(obj, indent=2, default=str).encode()
+
+
+def get_image_id(image_info):
+    """Stable id for an image entry (its response_id), or None if it has none."""
+    if isinstance(image_info, dict):
+        return image_info.get("response_id") or image_info.get("id")
+    return None
+
+
+def is_http_url(value):
+    """Whether a value is an http(s) URL string."""
+    return isinstance(value, str) and value.startswith(("https://", "http://"))
+
+
+def load_manifest(output_dir: Path):
+    """Map image id -> filename for downloads recorded in the manifest that are still on disk."""
+    # One directory scan up front keeps the per-image check a dict lookup
+    existing = {
+        entry.name for entry in os.scandir(output_dir)
+        if entry.is_file() and entry.stat().st_size > 0
+    }
+    done = {}
+    try:
+        with open(output_dir / MANIFEST_NAME) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                if record.get("file") in existing:
+                    done[record["id"]] = record["file"]
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def sniff_extension(head):
+    """File extension for an image body from its first bytes; PNG if unrecognised."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return "png"
+
+
+def preallocate(f, length):
+    """Reserve `length` bytes for `f` up front so the filesystem can lay it out contiguously."""
+    if length <= 0 or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), 0, length)
+    except OSError:
+        pass  # not supported by this filesystem; the write just grows the file
+
+
+def is_ideogram_url(url):
+    """Whether `url` points at ideogram.ai itself (the only host that gets our credentials)."""
+    host = urlsplit(url).hostname or ""
+    return host == "ideogram.ai" or host.endswith(".ideogram.ai")
+
+
+def iter_chunks(resp):
+    """Async-iterate a streamed response body in CHUNK_SIZE pieces."""
+    if USE_CURL_CFFI:
+        return resp.aiter_content(CHUNK_SIZE)
+    return resp.aiter_bytes(CHUNK_SIZE)
 
 
 class IdeogramDownloader:
-    def __init__(self, cookie: str, auth_token: str, user_id: str):
+    def __init__(self, cookie: str, auth_token: str, user_id: str,
+                 concurrency: int = DOWNLOAD_CONCURRENCY, force: bool = False):
         self.cookie = cookie
         self.auth_token = auth_token
         self.user_id = user_id
+        self.sem = asyncio.Semaphore(concurrency)
+        self.force = force
+        self.done = {}  # image id -> filename already on disk from an earlier run
+        self.taken = set()  # filenames in self.done, which new downloads must not reuse
+        self.direct_urls = {}  # image id -> signed CDN URL from the batch endpoint
+        self._list_key = None  # key holding the image list in listing responses, once known
+        self.manifest = None
         
         headers = HEADERS.copy()
         headers["Authorization"] = f"Bearer {auth_token}"
-        
-        if USE_CURL_CFFI:
-            self.session = requests.Session()
-            self.session.headers = headers
-            self.session.cookies = Cookies(parse_cookie_string(cookie))
-        else:
-            self.session = std_requests.Session()
-            self.session.headers.update(headers)
-            self.session.cookies.update(parse_cookie_string(cookie))
+        self.session = self._make_client(headers, parse_cookie_string(cookie), concurrency)
+        # Signed CDN URLs from the batch endpoint can live on other hosts; those are
+        # fetched by a second client that never carries the token or the cookies
+        self.cdn_session = self._make_client(HEADERS, {}, concurrency)
     
-    def _get(self, url, **kwargs):
-        """Make a GET request with browser impersonation if available."""
+    @staticmethod
+    def _make_client(headers, cookies, concurrency):
+        """HTTP client for one host, multiplexing requests over a single HTTP/2 connection when it can."""
         if USE_CURL_CFFI:
-            return self.session.get(url, impersonate=BROWSER_VERSION, **kwargs)
-        else:
-            return self.session.get(url, **kwargs)
+            # libcurl's multi handle multiplexes by default once H2 is negotiated
+            return AsyncSession(
+                headers=headers,
+                cookies=Cookies(cookies),
+                impersonate=BROWSER_VERSION,
+                http_version=CurlHttpVersion.V2TLS,
+                max_clients=concurrency,
+            )
+        # Client-level http2/limits are ignored once a transport is given. Once HTTP/2 is
+        # negotiated the pool multiplexes everything over one connection anyway; the limit
+        # only opens more when we're on HTTP/1.1 (no h2, or the server won't do H2).
+        transport = httpx.AsyncHTTPTransport(
+            http2=USE_HTTP2,
+            retries=MAX_RETRIES,  # connection failures only
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency,
+                                keepalive_expiry=30),
+        )
+        return httpx.AsyncClient(
+            headers=headers,
+            cookies=cookies,
+            follow_redirects=True,
+            transport=transport,
+        )
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    async def close(self):
+        """Close the HTTP clients and release their pooled connections."""
+        for session in (self.session, self.cdn_session):
+            if USE_CURL_CFFI:
+                await session.close()
+            else:
+                await session.aclose()
     
-    def _post(self, url, **kwargs):
-        """Make a POST request with browser impersonation if available."""
+    async def _send(self, method, url, stream=False, **kwargs):
+        """Issue one request; with stream=True the body is left unread. Credentials only go to ideogram.ai."""
+        session = self.session if is_ideogram_url(url) else self.cdn_session
         if USE_CURL_CFFI:
-            return self.session.post(url, impersonate=BROWSER_VERSION, **kwargs)
-        else:
-            return self.session.post(url, **kwargs)
+            return await session.request(method, url, stream=stream, **kwargs)
+        request = session.build_request(method, url, **kwargs)
+        return await session.send(request, stream=stream)
+    
+    async def _request(self, method, url, stream=False, **kwargs):
+        """
+        Send a request, retrying throttled/5xx responses. We only ever wait when
+        the server asks us to: for as long as its Retry-After says, else with
+        exponential backoff.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            resp = await self._send(method, url, stream=stream, **kwargs)
+            if resp.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return resp
+            delay = retry_after(resp) or RETRY_BACKOFF * 2 ** attempt
+            if stream:
+                await resp.aclose()
+            await asyncio.sleep(delay)
+    
+    async def _get(self, url, **kwargs):
+        """Make a GET request (browser impersonation is set on the session)."""
+        return await self._request("GET", url, **kwargs)
+    
+    async def _post(self, url, **kwargs):
+        """Make a POST request (browser impersonation is set on the session)."""
+        return await self._request("POST", url, **kwargs)
 
-    def discover_api(self):
+    async def discover_api(self):
         """
         Try known internal API patterns to find the endpoint that lists user images.
         The web app must use one of these to load the creations/profile page.
@@ -135,51 +353,55 @@ class IdeogramDownloader:
             ("POST", f"{BASE_URL}/api/graphql", {"query": "query { userCreations { id url } }"}),
         ]
         
-        working_endpoints = []
+        # Probes are independent, so fire them together rather than one by one
+        sem = asyncio.Semaphore(PROBE_CONCURRENCY)
+        results = await asyncio.gather(*(self._probe(sem, spec) for spec in endpoints_to_try))
         
-        for method, url, body in endpoints_to_try:
-            try:
+        # gather() keeps input order, so the most likely endpoints stay first
+        return [result for result in results if result]
+
+    async def _probe(self, sem, spec):
+        """Probe one candidate endpoint; returns (method, url, body, data) if it lists images."""
+        method, url, body = spec
+        try:
+            async with sem:
                 if method == "GET":
-                    resp = self._get(url)
+                    resp = await self._get(url)
                 else:
                     if body:
-                        resp = self._post(url, data=json.dumps(body))
+                        resp = await self._post(url, json=body)
                     else:
-                        resp = self._post(url)
-                
-                status = resp.status_code
-                content_type = resp.headers.get("content-type", "")
-                
-                if status == 200 and "json" in content_type:
-                    data = resp.json()
-                    print(f"  ✅ {method} {url} → 200 OK (JSON)")
-                    # Try to detect if it has image data
-                    data_str = json.dumps(data)
-                    has_images = any(k in data_str for k in ["response_id", "image_url", "url", "thumbnail", "prompt"])
-                    if has_images:
-                        print(f"     → Contains image data! Keys: {list(data.keys()) if isinstance(data, dict) else 'array'}")
-                        working_endpoints.append((method, url, body, data))
-                    else:
-                        print(f"     → JSON but no image data detected. Keys: {list(data.keys()) if isinstance(data, dict) else type(data).__name__}")
-                elif status == 200:
-                    print(f"  ⚠️  {method} {url} → 200 but content-type: {content_type}")
-                else:
-                    print(f"  ❌ {method} {url} → {status}")
-                    
-            except Exception as e:
-                print(f"  ❌ {method} {url} → Error: {e}")
+                        resp = await self._post(url)
+            
+            status = resp.status_code
+            content_type = resp.headers.get("content-type", "")
             
-            time.sleep(0.3)  # Be gentle
+            if status == 200 and "json" in content_type:
+                data = load_json(resp.content)
+                print(f"  ✅ {method} {url} → 200 OK (JSON)")
+                # Try to detect if it has image data
+                if has_image_keys(data):
+                    print(f"     → Contains image data! Keys: {list(data.keys()) if isinstance(data, dict) else 'array'}")
+                    return (method, url, body, data)
+                else:
+                    print(f"     → JSON but no image data detected. Keys: {list(data.keys()) if isinstance(data, dict) else type(data).__name__}")
+            elif status == 200:
+                print(f"  ⚠️  {method} {url} → 200 but content-type: {content_type}")
+            else:
+                print(f"  ❌ {method} {url} → {status}")
+                
+        except Exception as e:
+            print(f"  ❌ {method} {url} → Error: {e}")
         
-        return working_endpoints
+        return None
 
-    def fetch_all_images(self, endpoint_info=None):
+    async def fetch_all_images(self, endpoint_info=None):
         """
         Fetch all image metadata from the discovered endpoint.
         If no endpoint is provided, runs discovery first.
         """
         if not endpoint_info:
-            endpoints = self.discover_api()
+            endpoints = await self.discover_api()
             if not endpoints:
                 print("\n❌ Could not discover the image listing endpoint automatically.")
                 print("\nManual steps to find it:")
@@ -194,42 +416,57 @@ class IdeogramDownloader:
             method, url, body, sample_data = endpoints[0]
             print(f"\nUsing endpoint: {method} {url}")
         
-        # Try to paginate through all results
+        else:
+            method, url, body = endpoint_info[:3]
+        
+        # Paginate through all results, fetching PAGE_PREFETCH pages at a time
         all_images = []
+        seen_ids = set()
+        page_size = None
         page = 0
         
         while True:
-            print(f"Fetching page {page}...")
+            pages = range(page, page + PAGE_PREFETCH)
+            print(f"Fetching pages {pages[0]}-{pages[-1]}...")
+            results = await asyncio.gather(*(self._fetch_page(url, body, p) for p in pages))
             
-            if body and isinstance(body, dict):
-                body["page"] = page
-                resp = self._post(url, data=json.dumps(body))
-            elif "?" in url:
-                paginated_url = f"{url}&page={page}" if "page" not in url else url.replace(f"page={page-1}", f"page={page}")
-                resp = self._get(paginated_url)
-            else:
-                resp = self._get(f"{url}?page={page}")
-            
-            if resp.status_code != 200:
-                print(f"Got status {resp.status_code}, stopping pagination.")
-                break
-            
-            data = resp.json()
-            
-            # Try to extract image entries from various response shapes
-            images = self._extract_images(data)
-            
-            if not images:
-                print(f"No more images found on page {page}.")
-                break
-            
-            all_images.extend(images)
-            print(f"  Found {len(images)} images (total: {len(all_images)})")
+            # Results come back in page order; the first empty page ends the listing
+            for p, images in zip(pages, results):
+                if not images:
+                    if images is not None:
+                        print(f"No more images found on page {p}.")
+                    return all_images
+                
+                # An endpoint that ignores `page` hands back the same list forever
+                ids = {get_image_id(img) for img in images} - {None}
+                if ids and ids <= seen_ids:
+                    print(f"Page {p} only repeats images already fetched, stopping pagination.")
+                    return all_images
+                seen_ids |= ids
+                
+                all_images.extend(images)
+                print(f"  Page {p}: {len(images)} images (total: {len(all_images)})")
+                
+                # A page shorter than the first one is the last
+                page_size = page_size or len(images)
+                if len(images) < page_size:
+                    return all_images
             
-            page += 1
-            time.sleep(0.5)
+            page += PAGE_PREFETCH
+
+    async def _fetch_page(self, url, body, page):
+        """Fetch one listing page; returns its images, or None on an HTTP error."""
+        if body and isinstance(body, dict):
+            resp = await self._post(url, json={**body, "page": page})
+        else:
+            resp = await self._get(set_query_param(url, "page", page))
+        
+        if resp.status_code != 200:
+            print(f"Got status {resp.status_code} for page {page}, stopping pagination.")
+            return None
         
-        return all_images
+        # Try to extract image entries from various response shapes
+        return self._extract_images(load_json(resp.content))
 
     def _extract_images(self, data):
         """Try to extract image entries from various API response formats."""
@@ -237,9 +474,15 @@ class IdeogramDownloader:
             return data
         
         if isinstance(data, dict):
+            # Every page of one endpoint has the same shape, so reuse the key we found last time
+            images = data.get(self._list_key)
+            if isinstance(images, list):
+                return images
+            
             # Try common keys
             for key in ["responses", "images", "results", "data", "creations", "items", "generations"]:
                 if key in data and isinstance(data[key], list):
+                    self._list_key = key
                     return data[key]
             
             # Try nested
@@ -247,21 +490,67 @@ class IdeogramDownloader:
                 val = data[key]
                 if isinstance(val, list) and len(val) > 0:
                     if isinstance(val[0], dict):
+                        self._list_key = key
                         return val
         
         return []
 
-    def download_image(self, image_info, output_dir, index):
-        """Download a single image."""
-        # Try various URL patterns
+    async def fetch_direct_urls(self, image_ids):
+        """
+        Resolve image ids to signed CDN URLs via the batch endpoint, DIRECT_BATCH_SIZE per call.
+        Returns {} when the endpoint isn't available, so downloads fall back to per-image URLs.
+        """
+        batches = [image_ids[i:i + DIRECT_BATCH_SIZE] for i in range(0, len(image_ids), DIRECT_BATCH_SIZE)]
+        if not batches:
+            return {}
+        
+        # The first batch doubles as the probe; only fan out the rest if it worked
+        urls = await self._fetch_direct_batch(batches[0])
+        if not urls:
+            print("Batch URL endpoint not available, downloading images one by one.")
+            return {}
+        for found in await asyncio.gather(*(self._fetch_direct_batch(b) for b in batches[1:])):
+            urls.update(found)
+        print(f"Resolved {len(urls)} signed URLs in {len(batches)} batch requests.")
+        return urls
+
+    async def _fetch_direct_batch(self, image_ids):
+        """POST one batch of ids; returns {id: url} for whatever the server resolved."""
+        try:
+            async with self.sem:
+                resp = await self._post(DIRECT_BATCH_URL, json={"ids": image_ids})
+            if resp.status_code != 200 or "json" not in resp.headers.get("content-type", ""):
+                return {}
+            data = load_json(resp.content)
+        except Exception:
+            return {}
+        
+        # Accept either {id: url} or a list of entries carrying an id and a URL, but only
+        # URLs for ids we asked about, so error/status bodies don't pass for resolved images
+        wanted = set(image_ids)
+        if isinstance(data, dict):
+            urls = {k: v for k, v in data.items() if k in wanted and is_http_url(v)}
+            if urls:
+                return urls
+            data = next((v for v in data.values() if isinstance(v, list)), [])
+        urls = {}
+        for entry in data if isinstance(data, list) else []:
+            if isinstance(entry, dict):
+                url = entry.get("signed_url") or entry.get("url")
+                if get_image_id(entry) in wanted and is_http_url(url):
+                    urls[get_image_id(entry)] = url
+        return urls
+
+    def _resolve_image(self, image_info):
+        """Work out the download URL and prompt for an image entry."""
         url = None
         prompt = "unknown"
         
         if isinstance(image_info, dict):
             # Try to get the direct download URL
-            response_id = image_info.get("response_id") or image_info.get("id")
+            response_id = get_image_id(image_info)
             if response_id:
-                url = f"{BASE_URL}/api/images/direct/{response_id}"
+                url = self.direct_urls.get(response_id) or f"{BASE_URL}/api/images/direct/{response_id}"
             
             # Or a direct URL
             if not url:
@@ -271,43 +560,75 @@ class IdeogramDownloader:
         elif isinstance(image_info, str):
             url = image_info
         
+        return url, prompt
+
+    async def _save_image(self, resp, output_dir: Path, index, prompt, image_id=None):
+        """Stream a successful image response to disk and return its filename."""
+        # The body's magic bytes are more trustworthy than its content-type
+        chunks = iter_chunks(resp)
+        first_chunk = await anext(chunks, b"")
+        ext = sniff_extension(first_chunk)
+        
+        # Clean prompt for filename
+        safe_prompt = WHITESPACE_RE.sub('_', UNSAFE_CHARS_RE.sub('', prompt[:60]).strip())
+        filename = f"{index:04d}_{safe_prompt}.{ext}"
+        # New creations shift the listing, and rerolls share a prompt, so this name may
+        # already belong to a different image the manifest says is done; don't overwrite it
+        if filename in self.taken:
+            filename = f"{index:04d}_{safe_prompt}_{image_id or 'new'}.{ext}"
+        filepath = output_dir / filename
+        
+        try:
+            with open(filepath, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+                preallocate(f, int(resp.headers.get("content-length") or 0))
+                f.write(first_chunk)
+                async for chunk in chunks:
+                    f.write(chunk)
+                # Drop any preallocated tail if the body came in shorter than advertised
+                f.truncate()
+                size_kb = f.tell() / 1024
+        except BaseException:
+            # A preallocated file cut off mid-transfer would look complete by its size
+            filepath.unlink(missing_ok=True)
+            raise
+        
+        print(f"  ✅ {filename} ({size_kb:.0f} KB)")
+        return filename
+
+    async def download_image(self, image_info, output_dir: Path, index):
+        """Download a single image; at most `concurrency` run at once."""
+        image_id = get_image_id(image_info)
+        if image_id in self.done:
+            return True
+        
+        url, prompt = self._resolve_image(image_info)
         if not url:
             print(f"  ⚠️ Could not determine URL for image {index}")
             return False
         
         try:
-            resp = self._get(url)
-            if resp.status_code != 200:
-                print(f"  ❌ Failed to download image {index}: HTTP {resp.status_code}")
-                return False
-            
-            # Determine file extension from content-type
-            content_type = resp.headers.get("content-type", "image/png")
-            ext = "png"
-            if "jpeg" in content_type or "jpg" in content_type:
-                ext = "jpg"
-            elif "webp" in content_type:
-                ext = "webp"
-            
-            # Clean prompt for filename
-            safe_prompt = re.sub(r'[^\w\s-]', '', prompt[:60]).strip().replace(' ', '_')
-            filename = f"{index:04d}_{safe_prompt}.{ext}"
-            filepath = os.path.join(output_dir, filename)
+            async with self.sem:
+                resp = await self._get(url, stream=True)
+                try:
+                    if resp.status_code != 200:
+                        print(f"  ❌ Failed to download image {index}: HTTP {resp.status_code}")
+                        return False
+                    filename = await self._save_image(resp, output_dir, index, prompt, image_id)
+                finally:
+                    await resp.aclose()
             
-            with open(filepath, "wb") as f:
-                f.write(resp.content)
-            
-            size_kb = len(resp.content) / 1024
-            print(f"  ✅ {filename} ({size_kb:.0f} KB)")
+            if image_id and self.manifest:
+                self.manifest.write(json.dumps({"id": image_id, "file": filename}) + "\n")
             return True
             
         except Exception as e:
             print(f"  ❌ Error downloading image {index}: {e}")
             return False
 
-    def download_all(self, output_dir="./ideogram_images"):
+    async def download_all(self, output_dir="./ideogram_images"):
         """Main entry point: discover API, list all images, download them all."""
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        out_dir = Path(output_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
         
         print("=" * 60)
         print("Ideogram Bulk Image Downloader")
@@ -317,7 +638,7 @@ class IdeogramDownloader:
         print()
         
         # Step 1: Discover API
-        images = self.fetch_all_images()
+        images = await self.fetch_all_images()
         
         if not images:
             print("\nNo images found to download.")
@@ -327,28 +648,41 @@ class IdeogramDownloader:
         print(f"Found {len(images)} images. Starting download...")
         print(f"{'=' * 60}\n")
         
-        # Save metadata
-        metadata_file = os.path.join(output_dir, "metadata.json")
-        with open(metadata_file, "w") as f:
-            json.dump(images, f, indent=2, default=str)
-        print(f"Saved metadata to {metadata_file}\n")
+        # Save metadata in the background so downloads can start straight away
+        metadata_file = out_dir / "metadata.json"
+        metadata_writer = threading.Thread(
+            target=metadata_file.write_bytes, args=(dump_json(images),))
+        metadata_writer.start()
+        print(f"Saving metadata to {metadata_file}\n")
         
-        # Step 2: Download all images
-        success = 0
-        failed = 0
+        # Step 2: Download all images concurrently, skipping ones an earlier run finished (unless --force)
+        self.done = {} if self.force else load_manifest(out_dir)
+        self.taken = set(self.done.values())
+        skipped = sum(1 for img in images if get_image_id(img) in self.done)
+        if skipped:
+            print(f"Skipping {skipped} images already downloaded (use --force to fetch them again).\n")
         
-        for i, img in enumerate(images):
-            if self.download_image(img, output_dir, i):
-                success += 1
-            else:
-                failed += 1
-            
-            # Rate limit
-            if (i + 1) % 10 == 0:
-                time.sleep(1)
+        # One round trip per DIRECT_BATCH_SIZE images instead of one per image, if supported
+        pending_ids = [i for i in map(get_image_id, images) if i and i not in self.done]
+        self.direct_urls = await self.fetch_direct_urls(pending_ids)
+        
+        # Line-buffered so every finished download is recorded even if we're interrupted
+        with open(out_dir / MANIFEST_NAME, "a", buffering=1) as self.manifest:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [
+                    tg.create_task(self.download_image(img, out_dir, i))
+                    for i, img in enumerate(images)
+                ]
+        self.manifest = None
+        metadata_writer.join()
+        results = [task.result() for task in tasks]
+        success = sum(results)
+        failed = len(results) - success
         
         print(f"\n{'=' * 60}")
-        print(f"Done! Downloaded {success}/{len(images)} images.")
+        print(f"Done! Downloaded {success - skipped}/{len(images)} images.")
+        if skipped:
+            print(f"Already present: {skipped}")
         if failed:
             print(f"Failed: {failed}")
         print(f"Output directory: {output_dir}")
@@ -356,18 +690,20 @@ class IdeogramDownloader:
 
 
 def load_env():
-    """Try to load .env file if it exists."""
+    """Try to load .env file if it exists. Variables already set in the environment win."""
     env_file = Path(__file__).parent / ".env"
     if env_file.exists():
         with open(env_file) as f:
             for line in f:
                 line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, value = line.split("=", 1)
-                    os.environ[key.strip()] = value.strip().strip('"').strip("'")
+                if not line or line.startswith("#"):
+                    continue
+                key, sep, value = line.partition("=")
+                if sep:
+                    os.environ.setdefault(key.strip(), value.strip().strip("\"'"))
 
 
-def main():
+async def main():
     load_env()
     
     parser = argparse.ArgumentParser(
@@ -385,6 +721,10 @@ def main():
                        default="./ideogram_images")
     parser.add_argument("--discover-only", action="store_true",
                        help="Only discover API endpoints, don't download")
+    parser.add_argument("--concurrency", "-j", type=int, default=DOWNLOAD_CONCURRENCY,
+                       help=f"Parallel image downloads (default: {DOWNLOAD_CONCURRENCY})")
+    parser.add_argument("--force", action="store_true",
+                       help="Download every image again, even ones a previous run finished")
     
     args = parser.parse_args()
     
@@ -410,13 +750,13 @@ def main():
         print('   IDEO_USER_ID="your_user_id_here"')
         sys.exit(1)
     
-    downloader = IdeogramDownloader(args.cookie, args.token, args.user_id)
-    
-    if args.discover_only:
-        downloader.discover_api()
-    else:
-        downloader.download_all(args.output)
+    async with IdeogramDownloader(args.cookie, args.token, args.user_id, args.concurrency,
+                                  args.force) as downloader:
+        if args.discover_only:
+            await downloader.discover_api()
+        else:
+            await downloader.download_all(args.output)
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -19,83 +19,282 @@ import os
 import re
 import sys
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
 
 from playwright.async_api import async_playwright
 
+try:
+    import aiohttp
+    from yarl import URL
+    USE_AIOHTTP = True
+except ImportError:
+    USE_AIOHTTP = False
+
+try:
+    import orjson
+    USE_ORJSON = True
+except ImportError:
+    USE_ORJSON = False
+
+DOWNLOAD_CONCURRENCY = 16
+MAX_RATE = 10  # requests per second to ideogram.ai, to stay under Cloudflare's rate limiting
+MAX_RETRIES = 5
+MAX_BACKOFF = 30  # seconds
+IO_WORKERS = 8  # threads for disk writes, so they never block the event loop
+CHUNK_SIZE = 64 * 1024  # bytes per read when streaming an image to disk
+PROGRESS_INTERVAL = 2  # seconds between progress lines while downloading
+PAGE_TIMEOUT = 20  # seconds to wait for a page's first image data after navigating
+SCROLL_PAUSE_MS = 500  # between scrolls, for the next page of results to render
+SCROLL_IDLE_LIMIT = 8  # scrolls without the page growing before we decide everything is loaded
+MAX_SCROLLS = 2000  # hard stop for the in-page scroller
+CLOUDFLARE_TIMEOUT = 25  # seconds to wait for the "Just a moment" challenge to clear
+UNSAFE_CHARS_RE = re.compile(r'[^\w\s-]')
+COOKIE_RE = re.compile(r'session_cookie=([^;]+)')
+API_LOG_SIZE = 1000  # most recent API responses remembered for the debug dumps
+STATE_NAME = "state.json"  # saved Playwright storage state (cookies incl. Cloudflare clearance)
+MANIFEST_NAME = "manifest.jsonl"  # one {"id", "file"} line per finished download, for resuming
+
+# Drives the whole infinite scroll inside the page with a single evaluate: keeps jumping to the
+# bottom until the page height has stopped growing for `idleLimit` pauses in a row
+SCROLL_ALL_JS = """
+async ([pauseMs, idleLimit, maxScrolls]) => {
+    let last = -1, idle = 0, scrolls = 0;
+    while (idle < idleLimit && scrolls < maxScrolls) {
+        window.scrollTo(0, document.body.scrollHeight);
+        scrolls++;
+        await new Promise(resolve => setTimeout(resolve, pauseMs));
+        const height = document.body.scrollHeight;
+        idle = height === last ? idle + 1 : 0;
+        last = height;
+    }
+    return scrolls;
+}
+"""
+# Path prefixes of the API endpoints that return image listings; everything else is skipped unparsed
+IMAGE_API_PREFIXES = (
+    '/api/g/', '/api/images/', '/api/gallery/', '/api/u/', '/api/user/', '/api/users/',
+    '/api/creations/', '/api/profile/',
+)
+# Raw-byte markers for responses worth parsing; checked before any JSON decoding
+IMAGE_KEY_MARKERS = (b'"response_id"', b'"thumbnail_url"', b'"prompt"', b'"image_url"')
+
+# Image extension by Content-Type (parameters stripped); unknown types fall back to sniffing
+EXT_BY_MIME = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/webp': 'webp',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/avif': 'avif',
+}
+
+# Leading bytes of each image format we save (WebP is RIFF....WEBP, checked separately)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF8", "gif"),
+)
+
+
+def load_json(content):
+    """Parse a JSON response body (bytes), using orjson when it's installed."""
+    if USE_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dump_json(obj):
+    """Serialise `obj` to indented JSON bytes, using orjson when it's installed."""
+    if USE_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(obj, indent=2, default=str).encode()
+
+
+def sniff_extension(head):
+    """File extension for an image body from its first bytes; PNG if unrecognised."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return "png"
+
+
+def load_manifest(output_dir: Path):
+    """Map image id -> filename for downloads recorded in the manifest that are still on disk."""
+    # One directory scan up front keeps the per-image check a dict lookup
+    existing = {
+        entry.name for entry in os.scandir(output_dir)
+        if entry.is_file() and entry.stat().st_size > 0
+    }
+    done = {}
+    try:
+        with open(output_dir / MANIFEST_NAME) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                if record.get("file") in existing:
+                    done[record["id"]] = record["file"]
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class RateLimiter:
+    """Async rate limiter: spaces acquisitions at least `period / rate` seconds apart."""
+
+    def __init__(self, rate, period=1.0):
+        self.interval = period / rate
+        self.next_slot = 0.0
+
+    async def __aenter__(self):
+        # No await between reading and bumping next_slot, so this is race-free on one loop
+        now = time.monotonic()
+        wait = self.next_slot - now
+        self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc_info):
+        return False
+
 
 class IdeogramBrowserDownloader:
-    def __init__(self, session_cookie: str, output_dir: str = "./ideogram_images"):
+    def __init__(self, session_cookie: str, output_dir: str = "./ideogram_images",
+                 max_rate: float = MAX_RATE, max_concurrency: int = DOWNLOAD_CONCURRENCY,
+                 debug: bool = False, force: bool = False):
         self.session_cookie = session_cookie
         self.output_dir = output_dir
-        self.api_responses = []
+        self.debug = debug
+        self.force = force
+        self.done = {}  # image id -> filename already on disk from an earlier run
+        self.taken = set()  # stems of the filenames in self.done, which new downloads must not reuse
+        self.manifest = None
+        self.limiter = RateLimiter(max_rate)
+        self.max_concurrency = max_concurrency
+        self.sem = asyncio.Semaphore(max_concurrency)
+        self.http = None  # aiohttp session for image downloads, opened in download_images
+        self.http_blocked = False  # set once Cloudflare challenges that session
+        self._io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS)
+        self.api_response_urls = deque(maxlen=API_LOG_SIZE)  # url/data_keys/n_images per captured response
+        self.debug_responses = deque(maxlen=API_LOG_SIZE)  # full bodies, only filled with --debug
         self.image_urls = []
         self.all_image_data = []
+        self._seen_ids = set()
+        self.images_captured = asyncio.Event()  # set whenever intercept_response finds image data
         Path(output_dir).mkdir(parents=True, exist_ok=True)
     
     async def intercept_response(self, response):
         """Intercept API responses to capture image metadata."""
         url = response.url
-        if '/api/' in url and response.status == 200:
+        if urlsplit(url).path.startswith(IMAGE_API_PREFIXES) and response.status == 200:
             try:
                 content_type = response.headers.get('content-type', '')
                 if 'json' in content_type:
-                    body = await response.json()
-                    body_str = json.dumps(body)
-                    # Check if this response contains image data
-                    if any(k in body_str for k in ['response_id', 'thumbnail_url', 'prompt', 'image_url']):
-                        self.api_responses.append({
+                    raw = await response.body()
+                    # Check if this response contains image data before parsing it
+                    if any(k in raw for k in IMAGE_KEY_MARKERS):
+                        body = load_json(raw)
+                        self.api_response_urls.append({
                             'url': url,
-                            'data': body
+                            'data_keys': list(body.keys()) if isinstance(body, dict) else type(body).__name__,
+                            'n_images': self._collect_images(body),
                         })
+                        if self.debug:
+                            self.debug_responses.append({'url': url, 'data': body})
                         print(f"  📡 Captured API response: {url[:80]}")
+                        if self.api_response_urls[-1]['n_images']:
+                            self.images_captured.set()
             except Exception:
                 pass
     
-    def extract_images_from_responses(self):
-        """Extract all unique image entries from captured API responses."""
-        seen_ids = set()
-        
-        for resp in self.api_responses:
-            data = resp['data']
-            images = self._find_images_recursive(data)
-            for img in images:
-                img_id = img.get('response_id') or img.get('id') or img.get('request_id', '')
-                if img_id and img_id not in seen_ids:
-                    seen_ids.add(img_id)
-                    self.all_image_data.append(img)
-        
-        return self.all_image_data
+    async def _wait_for_images(self, timeout):
+        """Wait until intercept_response captures image data; returns False if `timeout` seconds pass first."""
+        try:
+            await asyncio.wait_for(self.images_captured.wait(), timeout)
+            return True
+        except TimeoutError:
+            return False
     
-    def _find_images_recursive(self, data, depth=0):
-        """Recursively search through nested data for image entries."""
-        if depth > 10:
-            return []
-        
+    async def _goto(self, page, url, timeout=PAGE_TIMEOUT):
+        """Navigate to `url` and return as soon as its first image API response has been captured."""
+        self.images_captured.clear()
+        try:
+            await page.goto(url, timeout=timeout * 1000)
+        except Exception:
+            pass
+        return await self._wait_for_images(timeout)
+    
+    async def _wait_for_cloudflare(self, page, response=None):
+        """Poll until Cloudflare's interstitial is gone; returns False if it outlasts CLOUDFLARE_TIMEOUT."""
+        # The challenge page is served with cf-mitigated and titled "Just a moment...";
+        # both are cheap to check, unlike serialising the whole DOM
+        challenge = page.locator('head > title', has_text='Just a moment')
+        if response is not None and response.headers.get('cf-mitigated') != 'challenge':
+            return True
+        if not await challenge.count():
+            return True
+        print("  ⏳ Waiting for Cloudflare challenge to resolve...")
+        deadline = time.monotonic() + CLOUDFLARE_TIMEOUT
+        while await challenge.count():
+            if time.monotonic() > deadline:
+                print("  ⚠️ Cloudflare challenge did not clear")
+                return False
+            await asyncio.sleep(0.25)
+        return True
+    
+    def _collect_images(self, data):
+        """Add the unique image entries from one API response to all_image_data; returns how many it had."""
+        images = self._find_images_recursive(data)
+        for img in images:
+            img_id = img.get('response_id') or img.get('id') or img.get('request_id', '')
+            if img_id and img_id not in self._seen_ids:
+                self._seen_ids.add(img_id)
+                self.all_image_data.append(img)
+        return len(images)
+    
+    def _find_images_recursive(self, data):
+        """Search through nested data for image entries, in document order."""
         results = []
+        visited = set()
         
-        if isinstance(data, list):
-            for item in data:
-                if isinstance(item, dict):
-                    # Check if this dict looks like an image entry
-                    has_image_keys = any(k in item for k in ['response_id', 'url', 'image_url', 'thumbnail_url', 'prompt'])
-                    if has_image_keys:
-                        results.append(item)
-                    else:
-                        results.extend(self._find_images_recursive(item, depth + 1))
-                elif isinstance(item, list):
-                    results.extend(self._find_images_recursive(item, depth + 1))
-        
-        elif isinstance(data, dict):
-            # Check if this dict itself is an image entry
-            has_image_keys = any(k in data for k in ['response_id', 'url', 'image_url', 'thumbnail_url'])
-            if has_image_keys and 'prompt' in data:
-                results.append(data)
+        # Walk with an explicit stack rather than recursing. Entries are
+        # (node, depth, is_image); children are pushed in reverse so they
+        # come off the stack in their original order.
+        stack = [(data, 0, False)]
+        while stack:
+            node, depth, is_image = stack.pop()
+            if is_image:
+                results.append(node)
+                continue
+            if depth > 10 or id(node) in visited:
+                continue
+            visited.add(id(node))
+            
+            if isinstance(node, list):
+                for item in reversed(node):
+                    if isinstance(item, dict):
+                        # Check if this dict looks like an image entry
+                        has_image_keys = any(k in item for k in ['response_id', 'url', 'image_url', 'thumbnail_url', 'prompt'])
+                        stack.append((item, depth, True) if has_image_keys else (item, depth + 1, False))
+                    elif isinstance(item, list):
+                        stack.append((item, depth + 1, False))
             
-            # Also search nested values
-            for key, value in data.items():
-                if isinstance(value, (list, dict)):
-                    results.extend(self._find_images_recursive(value, depth + 1))
+            elif isinstance(node, dict):
+                # Check if this dict itself is an image entry
+                has_image_keys = any(k in node for k in ['response_id', 'url', 'image_url', 'thumbnail_url'])
+                if has_image_keys and 'prompt' in node:
+                    results.append(node)
+                
+                # Also search nested values
+                for value in reversed(node.values()):
+                    if isinstance(value, (list, dict)):
+                        stack.append((value, depth + 1, False))
         
         return results
 
@@ -110,12 +309,18 @@ class IdeogramBrowserDownloader:
                 headless=True,
                 args=['--no-sandbox', '--disable-setuid-sandbox']
             )
+            # Reuse the previous run's cookies (including Cloudflare clearance) if we saved them
+            state_path = Path(self.output_dir) / STATE_NAME
+            restored = state_path.exists()
             context = await browser.new_context(
                 viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                storage_state=str(state_path) if restored else None,
             )
+            if restored:
+                print(f"  Reusing saved browser state from {state_path}")
             
-            # Set the session cookie
+            # Set the session cookie (on top of any saved state, so the one passed in wins)
             await context.add_cookies([{
                 'name': 'session_cookie',
                 'value': self.session_cookie,
@@ -133,79 +338,48 @@ class IdeogramBrowserDownloader:
             
             # Step 1: Navigate to profile page to pass Cloudflare and discover user ID
             print("\n📌 Step 1: Loading ideogram.ai...")
+            response = None
             try:
-                await page.goto('https://ideogram.ai', wait_until='networkidle', timeout=30000)
+                response = await page.goto('https://ideogram.ai', timeout=30000)
             except Exception as e:
                 print(f"  Initial load: {e}")
             
-            await asyncio.sleep(3)
-            
             # Check if we need to handle Cloudflare challenge
-            content = await page.content()
-            if 'Just a moment' in content or 'challenge' in content.lower():
-                print("  ⏳ Waiting for Cloudflare challenge to resolve...")
-                await asyncio.sleep(10)
-                content = await page.content()
-                if 'Just a moment' in content:
-                    print("  ⏳ Still waiting... (15 more seconds)")
-                    await asyncio.sleep(15)
+            await self._wait_for_cloudflare(page, response)
             
             # Step 2: Navigate to creations/profile page
             print("\n📌 Step 2: Navigating to profile/creations page...")
             
             # Try clicking the profile link or navigating directly
-            try:
-                await page.goto('https://ideogram.ai/my-images', wait_until='networkidle', timeout=30000)
-            except:
-                pass
-            await asyncio.sleep(3)
+            await self._goto(page, 'https://ideogram.ai/my-images', timeout=30)
             
             # If that didn't work, try other URLs
             current_url = page.url
             print(f"  Current URL: {current_url}")
             
-            if not self.api_responses:
+            if not self.api_response_urls:
                 print("  Trying /assets...")
-                try:
-                    await page.goto('https://ideogram.ai/assets', wait_until='networkidle', timeout=20000)
-                except:
-                    pass
-                await asyncio.sleep(3)
+                await self._goto(page, 'https://ideogram.ai/assets')
             
-            if not self.api_responses:
+            if not self.api_response_urls:
                 print("  Trying direct profile URL...")
-                try:
-                    await page.goto('https://ideogram.ai/u/NBWy2tr5tOZBEItRhLrbrVZvUE22', wait_until='networkidle', timeout=20000)
-                except:
-                    pass
-                await asyncio.sleep(3)
+                await self._goto(page, 'https://ideogram.ai/u/NBWy2tr5tOZBEItRhLrbrVZvUE22')
             
             # Step 3: Scroll to load all images (infinite scroll)
-            if self.api_responses:
+            if self.api_response_urls:
                 print(f"\n📌 Step 3: Scrolling to load all images...")
-                previous_count = 0
-                no_new_count = 0
-                
-                while no_new_count < 5:
-                    await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-                    await asyncio.sleep(2)
-                    
-                    current_count = len(self.api_responses)
-                    if current_count == previous_count:
-                        no_new_count += 1
-                        print(f"  Scroll {no_new_count}/5 with no new data ({current_count} API responses total)")
-                    else:
-                        no_new_count = 0
-                        print(f"  New data loaded! ({current_count} API responses)")
-                    previous_count = current_count
+                # One evaluate runs the whole scroll in the page; intercept_response captures as it goes
+                try:
+                    scrolls = await page.evaluate(SCROLL_ALL_JS, [SCROLL_PAUSE_MS, SCROLL_IDLE_LIMIT, MAX_SCROLLS])
+                    print(f"  Page stopped growing after {scrolls} scrolls ({len(self.all_image_data)} images total)")
+                except Exception as e:
+                    print(f"  Scrolling stopped early: {e}")
             else:
                 print("\n⚠️  No API responses captured yet. Let me try to find the page structure...")
                 # Dump what we can see
-                content = await page.content()
                 title = await page.title()
                 print(f"  Page title: {title}")
                 print(f"  Page URL: {page.url}")
-                print(f"  Content length: {len(content)}")
                 
                 # Look for any navigation links
                 links = await page.query_selector_all('a[href*="/u/"], a[href*="profile"], a[href*="creat"], a[href*="my-"]')
@@ -220,42 +394,29 @@ class IdeogramBrowserDownloader:
                 print(f"\n  Screenshot saved to: {screenshot_path}")
                 
                 # Also dump all network requests we saw
-                print(f"\n  Total API responses captured: {len(self.api_responses)}")
+                print(f"\n  Total API responses captured: {len(self.api_response_urls)}")
             
             # Step 4: Process captured data
             print(f"\n📌 Step 4: Processing captured data...")
-            print(f"  Total API responses: {len(self.api_responses)}")
+            print(f"  Total API responses: {len(self.api_response_urls)}")
             
             # Save raw API responses for debugging
             raw_path = os.path.join(self.output_dir, 'raw_api_responses.json')
-            with open(raw_path, 'w') as f:
-                json.dump([{'url': r['url'], 'data_keys': list(r['data'].keys()) if isinstance(r['data'], dict) else type(r['data']).__name__} for r in self.api_responses], f, indent=2, default=str)
+            Path(raw_path).write_bytes(dump_json(list(self.api_response_urls)))
             
-            images = self.extract_images_from_responses()
+            images = self.all_image_data
             print(f"  Unique images found: {len(images)}")
             
             if images:
                 # Save metadata
                 meta_path = os.path.join(self.output_dir, 'metadata.json')
-                with open(meta_path, 'w') as f:
-                    json.dump(images, f, indent=2, default=str)
+                Path(meta_path).write_bytes(dump_json(images))
                 print(f"  Metadata saved to: {meta_path}")
+                await self._save_state(context)
                 
                 # Step 5: Download images
                 print(f"\n📌 Step 5: Downloading {len(images)} images...")
-                success = 0
-                failed = 0
-                
-                for i, img in enumerate(images):
-                    result = await self.download_single(page, img, i)
-                    if result:
-                        success += 1
-                    else:
-                        failed += 1
-                    
-                    if (i + 1) % 10 == 0:
-                        print(f"  Progress: {i+1}/{len(images)}")
-                        await asyncio.sleep(1)
+                success, failed = await self.download_images(page, images)
                 
                 print(f"\n{'=' * 60}")
                 print(f"✅ Downloaded {success}/{len(images)} images")
@@ -264,22 +425,175 @@ class IdeogramBrowserDownloader:
             else:
                 print("\n❌ No images found in API responses.")
                 print("  The raw API data has been saved for debugging.")
-                # Dump all responses fully for analysis
-                full_path = os.path.join(self.output_dir, 'full_api_responses.json')
-                with open(full_path, 'w') as f:
-                    json.dump(self.api_responses, f, indent=2, default=str)
-                print(f"  Full API responses: {full_path}")
+                if self.debug:
+                    # Dump all responses fully for analysis
+                    full_path = os.path.join(self.output_dir, 'full_api_responses.json')
+                    Path(full_path).write_bytes(dump_json(list(self.debug_responses)))
+                    print(f"  Full API responses: {full_path}")
+                else:
+                    print("  Re-run with --debug to also save the full API responses.")
             
             print(f"Output directory: {self.output_dir}")
             print("=" * 60)
             
             await browser.close()
     
+    async def _save_state(self, context):
+        """Save cookies and local storage so the next run can skip login and the Cloudflare check."""
+        path = Path(self.output_dir) / STATE_NAME
+        await context.storage_state(path=str(path))
+        path.chmod(0o600)  # it holds the login session
+    
+    async def download_images(self, page, images):
+        """Download all images concurrently, at most max_concurrency at a time."""
+        self.success = 0
+        self.failed = 0
+        # Skip images an earlier run already finished, unless --force
+        out_dir = Path(self.output_dir)
+        self.done = {} if self.force else load_manifest(out_dir)
+        self.taken = {Path(f).stem for f in self.done.values()}
+        skipped = sum(1 for img in images if (img.get('response_id') or img.get('id')) in self.done)
+        if skipped:
+            print(f"  Skipping {skipped} images already downloaded (use --force to fetch them again)")
+        
+        await self._open_http(page)
+        stop = asyncio.Event()
+        reporter = asyncio.create_task(self._report_progress(len(images), stop))
+        try:
+            # Line-buffered so every finished download is recorded even if we're interrupted
+            with open(out_dir / MANIFEST_NAME, 'a', buffering=1) as self.manifest:
+                async with asyncio.TaskGroup() as tg:
+                    for i, img in enumerate(images):
+                        tg.create_task(self._fetch_one(page, img, i))
+        finally:
+            self.manifest = None
+            stop.set()
+            await reporter
+            await self._close_http()
+        return self.success, self.failed
+    
+    async def _fetch_one(self, page, img_data, index):
+        """Download one image, holding a semaphore slot for the request and write."""
+        async with self.sem:
+            ok = await self.download_single(page, img_data, index)
+        if ok:
+            self.success += 1
+        else:
+            self.failed += 1
+    
+    async def _report_progress(self, total, stop):
+        """Print download progress every PROGRESS_INTERVAL seconds until `stop` is set."""
+        last = 0
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), PROGRESS_INTERVAL)
+            except TimeoutError:
+                pass
+            done = self.success + self.failed
+            if done != last:
+                print(f"  Progress: {done}/{total}")
+                last = done
+    
+    async def _get(self, page, url):
+        """GET an image, rate limited and retried with backoff on 429."""
+        delay = 1
+        for attempt in range(MAX_RETRIES + 1):
+            async with self.limiter:
+                resp = await self._send(page, url)
+            if resp.status != 429 or attempt == MAX_RETRIES:
+                return resp
+            await self._discard(resp)
+            try:
+                wait = float(resp.headers.get('retry-after', ''))
+            except ValueError:
+                wait = delay
+            await asyncio.sleep(min(wait, MAX_BACKOFF))
+            delay = min(delay * 2, MAX_BACKOFF)
+    
+    async def _open_http(self, page):
+        """Open a keep-alive aiohttp session carrying the browser's ideogram.ai cookies."""
+        if not USE_AIOHTTP:
+            return
+        cookies = await page.context.cookies('https://ideogram.ai')
+        jar = aiohttp.CookieJar()
+        jar.update_cookies({c['name']: c['value'] for c in cookies}, response_url=URL('https://ideogram.ai'))
+        user_agent = await page.evaluate('navigator.userAgent')
+        self.http = aiohttp.ClientSession(
+            cookie_jar=jar,
+            connector=aiohttp.TCPConnector(limit_per_host=self.max_concurrency, keepalive_timeout=30),
+            headers={'User-Agent': user_agent, 'Referer': 'https://ideogram.ai/'},
+        )
+    
+    async def _close_http(self):
+        """Close the aiohttp session, if one was opened."""
+        if self.http:
+            await self.http.close()
+            self.http = None
+    
+    async def _send(self, page, url):
+        """Send one GET, over aiohttp when possible and through the browser otherwise."""
+        if self.http and not self.http_blocked:
+            resp = await self.http.get(url)
+            if resp.status != 403:
+                return resp
+            resp.release()
+            if resp.headers.get('cf-mitigated') == 'challenge' and not self.http_blocked:
+                # Cloudflare wants a real browser; send everything through Playwright from now on
+                print("  ⚠️ Cloudflare challenged the direct session, using the browser for downloads")
+                self.http_blocked = True
+        return await page.request.get(url)
+    
+    async def _discard(self, resp):
+        """Release a response without reading its body."""
+        if USE_AIOHTTP and isinstance(resp, aiohttp.ClientResponse):
+            resp.release()
+        else:
+            await resp.dispose()
+    
+    async def _save(self, resp, stem):
+        """Write a response body to `<stem>.<ext>` off the event loop; returns (filename, bytes written)."""
+        loop = asyncio.get_running_loop()
+        mime = resp.headers.get('content-type', '').split(';', 1)[0].strip().lower()
+        ext = EXT_BY_MIME.get(mime)
+        if not (USE_AIOHTTP and isinstance(resp, aiohttp.ClientResponse)):
+            body = await resp.body()
+            # Playwright holds fetched bodies in the driver until the context closes
+            await resp.dispose()
+            filename = f"{stem}.{ext or sniff_extension(body)}"
+            path = Path(self.output_dir) / filename
+            await loop.run_in_executor(self._io_pool, path.write_bytes, body)
+            return filename, len(body)
+        # Stream from aiohttp so only one chunk per download is ever in memory
+        try:
+            chunks = resp.content.iter_chunked(CHUNK_SIZE)
+            head = await anext(chunks, b'')
+            filename = f"{stem}.{ext or sniff_extension(head)}"
+            path = Path(self.output_dir) / filename
+            f = await loop.run_in_executor(self._io_pool, open, path, 'wb')
+            complete = False
+            try:
+                await loop.run_in_executor(self._io_pool, f.write, head)
+                size = len(head)
+                async for chunk in chunks:
+                    await loop.run_in_executor(self._io_pool, f.write, chunk)
+                    size += len(chunk)
+                complete = True
+            finally:
+                await loop.run_in_executor(self._io_pool, f.close)
+                if not complete:
+                    # Don't leave a truncated image behind when the stream fails part-way
+                    await loop.run_in_executor(self._io_pool, lambda: path.unlink(missing_ok=True))
+        finally:
+            resp.release()
+        return filename, size
+    
     async def download_single(self, page, img_data, index):
         """Download a single image using the browser context."""
         try:
             # Try to construct download URL
             response_id = img_data.get('response_id') or img_data.get('id')
+            if response_id in self.done:
+                return True
             url = None
             
             if response_id:
@@ -293,39 +607,31 @@ class IdeogramBrowserDownloader:
                 return False
             
             # Use the browser to download (bypasses Cloudflare)
-            response = await page.request.get(url)
+            response = await self._get(page, url)
             
             if response.status != 200:
                 # Try thumbnail as fallback
                 thumb = img_data.get('thumbnail_url')
                 if thumb and thumb != url:
-                    response = await page.request.get(thumb)
+                    await self._discard(response)
+                    response = await self._get(page, thumb)
                 
                 if response.status != 200:
                     print(f"  ❌ HTTP {response.status} for image {index}")
+                    await self._discard(response)
                     return False
             
-            body = await response.body()
-            
-            # Determine extension
-            content_type = response.headers.get('content-type', 'image/png')
-            ext = 'png'
-            if 'jpeg' in content_type or 'jpg' in content_type:
-                ext = 'jpg'
-            elif 'webp' in content_type:
-                ext = 'webp'
-            
-            # Create filename from prompt
+            # Create filename from prompt; the extension comes from the response
             prompt = img_data.get('prompt', 'unknown')
-            safe_prompt = re.sub(r'[^\w\s-]', '', prompt[:60]).strip().replace(' ', '_')
-            filename = f"{index:04d}_{safe_prompt}.{ext}"
-            filepath = os.path.join(self.output_dir, filename)
-            
-            with open(filepath, 'wb') as f:
-                f.write(body)
-            
-            size_kb = len(body) / 1024
-            print(f"  ✅ {filename} ({size_kb:.0f} KB)")
+            safe_prompt = UNSAFE_CHARS_RE.sub('', prompt[:60]).strip().replace(' ', '_')
+            stem = f"{index:04d}_{safe_prompt}"
+            # A reroll that shifted into an old index can collide with a file the manifest credits to another image
+            if stem in self.taken:
+                stem = f"{stem}_{response_id or 'new'}"
+            filename, size = await self._save(response, stem)
+            print(f"  ✅ {filename} ({size / 1024:.0f} KB)")
+            if response_id and self.manifest:
+                self.manifest.write(json.dumps({'id': response_id, 'file': filename}) + '\n')
             return True
             
         except Exception as e:
@@ -342,6 +648,14 @@ async def main():
                        default=os.environ.get("IDEO_SESSION_COOKIE", ""))
     parser.add_argument("--output", "-o", default="./ideogram_images",
                        help="Output directory")
+    parser.add_argument("--max-rate", type=float, default=MAX_RATE,
+                       help=f"Max requests per second to ideogram.ai (default: {MAX_RATE})")
+    parser.add_argument("--max-concurrency", type=int, default=DOWNLOAD_CONCURRENCY,
+                       help=f"Max parallel image downloads (default: {DOWNLOAD_CONCURRENCY})")
+    parser.add_argument("--debug", action="store_true",
+                       help="Keep full API response bodies and dump them if no images are found")
+    parser.add_argument("--force", action="store_true",
+                       help="Download every image again, even ones a previous run finished")
     
     args = parser.parse_args()
     
@@ -351,8 +665,7 @@ async def main():
         if env_file.exists():
             content = env_file.read_text()
             # Extract session cookie from the full cookie string
-            import re
-            match = re.search(r'session_cookie=([^;]+)', content)
+            match = COOKIE_RE.search(content)
             if match:
                 args.session_cookie = match.group(1)
     
@@ -364,7 +677,8 @@ async def main():
         print("   4. Run: python3 download_browser.py -s 'eyJ...'")
         sys.exit(1)
     
-    downloader = IdeogramBrowserDownloader(args.session_cookie, args.output)
+    downloader = IdeogramBrowserDownloader(args.session_cookie, args.output,
+                                           args.max_rate, args.max_concurrency, args.debug, args.force)
     await downloader.run()
 
 
@@ -24,26 +24,179 @@ USAGE:
 
 import asyncio
 import json
+import multiprocessing
 import os
 import re
 import sys
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import urlsplit
 from playwright.async_api import async_playwright
 
+try:
+    import aiohttp
+    from yarl import URL
+    USE_AIOHTTP = True
+except ImportError:
+    USE_AIOHTTP = False
+
+try:
+    import orjson
+    USE_ORJSON = True
+except ImportError:
+    USE_ORJSON = False
+
+DOWNLOAD_CONCURRENCY = 16
+MAX_RATE = 10  # requests per second to ideogram.ai, to stay under Cloudflare's rate limiting
+MAX_RETRIES = 5
+MAX_BACKOFF = 30  # seconds
+IO_WORKERS = 8  # threads for disk writes, so they never block the event loop
+CHUNK_SIZE = 64 * 1024  # bytes per read when streaming an image to disk
+PROGRESS_INTERVAL = 2  # seconds between progress lines while downloading
+PAGE_TIMEOUT = 15  # seconds to wait for a page's first image data after navigating
+SCROLL_PAUSE_MS = 500  # between scrolls, for the next page of results to render
+SCROLL_IDLE_LIMIT = 8  # scrolls without the page growing before we decide everything is loaded
+UNSAFE_CHARS_RE = re.compile(r'[^\w\s-]')
+
+# Path prefixes of the API endpoints that return image listings; everything else is skipped unparsed
+IMAGE_API_PREFIXES = (
+    '/api/g/', '/api/images/', '/api/gallery/', '/api/u/', '/api/user/', '/api/users/',
+    '/api/creations/', '/api/profile/',
+)
+API_LOG_SIZE = 1000  # most recent API responses remembered for the debug dumps
+STATE_NAME = "state.json"  # saved Playwright storage state (cookies incl. Cloudflare clearance)
+MANIFEST_NAME = "manifest.jsonl"  # one {"id", "file"} line per finished download, for resuming
+
+# Drives the whole infinite scroll inside the page with a single evaluate: keeps jumping to the
+# bottom until the page height has stopped growing for `idleLimit` pauses in a row
+SCROLL_ALL_JS = """
+async ([pauseMs, idleLimit, maxScrolls]) => {
+    let last = -1, idle = 0, scrolls = 0;
+    while (idle < idleLimit && scrolls < maxScrolls) {
+        window.scrollTo(0, document.body.scrollHeight);
+        scrolls++;
+        await new Promise(resolve => setTimeout(resolve, pauseMs));
+        const height = document.body.scrollHeight;
+        idle = height === last ? idle + 1 : 0;
+        last = height;
+    }
+    return scrolls;
+}
+"""
+
+# Image extension by Content-Type (parameters stripped); unknown types fall back to sniffing
+EXT_BY_MIME = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/webp': 'webp',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/avif': 'avif',
+}
+
+# Leading bytes of each image format we save (WebP is RIFF....WEBP, checked separately)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF8", "gif"),
+)
+
+
+def load_json(content):
+    """Parse a JSON response body (bytes), using orjson when it's installed."""
+    if USE_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dump_json(obj):
+    """Serialise `obj` to indented JSON bytes, using orjson when it's installed."""
+    if USE_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(obj, indent=2, default=str).encode()
+
+
+def sniff_extension(head):
+    """File extension for an image body from its first bytes; PNG if unrecognised."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return "png"
+
+
+def load_manifest(output_dir: Path):
+    """Map image id -> filename for downloads recorded in the manifest that are still on disk."""
+    # One directory scan up front keeps the per-image check a dict lookup
+    existing = {
+        entry.name for entry in os.scandir(output_dir)
+        if entry.is_file() and entry.stat().st_size > 0
+    }
+    done = {}
+    try:
+        with open(output_dir / MANIFEST_NAME) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                if record.get("file") in existing:
+                    done[record["id"]] = record["file"]
+    except FileNotFoundError:
+        pass
+    return done
+
+
+class RateLimiter:
+    """Async rate limiter: spaces acquisitions at least `period / rate` seconds apart."""
+
+    def __init__(self, rate, period=1.0):
+        self.interval = period / rate
+        self.next_slot = 0.0
+
+    async def __aenter__(self):
+        # No await between reading and bumping next_slot, so this is race-free on one loop
+        now = time.monotonic()
+        wait = self.next_slot - now
+        self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def __aexit__(self, *exc_info):
+        return False
+
 
 class IdeogramDownloader:
-    def __init__(self, output_dir="./ideogram_images"):
+    def __init__(self, output_dir="./ideogram_images", max_rate=MAX_RATE,
+                 max_concurrency=DOWNLOAD_CONCURRENCY, force=False, processes=1):
         self.output_dir = output_dir
-        self.api_responses = []
+        self.force = force
+        self.processes = processes
+        self.max_rate = max_rate
+        self.done = {}  # image id -> filename already on disk from an earlier run
+        self.taken = set()  # stems of the filenames in self.done, which new downloads must not reuse
+        self.manifest = None
+        self.limiter = RateLimiter(max_rate)
+        self.max_concurrency = max_concurrency
+        self.sem = asyncio.Semaphore(max_concurrency)
+        self.http = None  # aiohttp session for image downloads, opened in download_images
+        self.http_blocked = False  # set once Cloudflare challenges that session
+        self.forbidden = []  # indices a worker process got HTTP 403 for; the parent retries them
+        self._io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS)
+        self.api_response_urls = deque(maxlen=API_LOG_SIZE)  # url and image count per API response; bodies are not kept
         self.all_image_data = []
         self.user_id = None
+        self._seen_ids = set()
+        self.images_captured = asyncio.Event()  # set whenever on_response finds image data
         Path(output_dir).mkdir(parents=True, exist_ok=True)
 
     async def on_response(self, response):
         """Intercept all API responses."""
         url = response.url
-        if '/api/' not in url:
+        if not urlsplit(url).path.startswith(IMAGE_API_PREFIXES):
             return
         if response.status != 200:
             return
@@ -51,134 +204,323 @@ class IdeogramDownloader:
             ct = response.headers.get('content-type', '')
             if 'json' not in ct:
                 return
-            body = await response.json()
-            self.api_responses.append({'url': url, 'data': body})
+            body = load_json(await response.body())
             
             # Try to detect user_id
-            body_str = json.dumps(body)
-            if 'user_id' in body_str and not self.user_id:
-                if isinstance(body, dict) and 'user_id' in body:
-                    self.user_id = body['user_id']
+            if not self.user_id and isinstance(body, dict) and 'user_id' in body:
+                self.user_id = body['user_id']
                     
-            # Count image-like entries
+            # Deduplicate image-like entries as they arrive
             images = self._find_images(body)
+            for img in images:
+                rid = img.get('response_id') or img.get('id') or id(img)
+                if rid not in self._seen_ids:
+                    self._seen_ids.add(rid)
+                    self.all_image_data.append(img)
+            self.api_response_urls.append({'url': url, 'n_images': len(images)})
             if images:
+                self.images_captured.set()
                 print(f"  📡 {url[:70]}... → {len(images)} images")
         except:
             pass
 
-    def _find_images(self, data, depth=0):
-        """Find image entries in nested data."""
-        if depth > 8:
-            return []
+    def _find_images(self, data):
+        """Find image entries in nested data, in document order."""
         results = []
-        if isinstance(data, list):
-            for item in data:
-                if isinstance(item, dict) and any(k in item for k in ['response_id', 'url', 'thumbnail_url']):
-                    results.append(item)
-                else:
-                    results.extend(self._find_images(item, depth+1))
-        elif isinstance(data, dict):
-            if any(k in data for k in ['response_id']) and 'prompt' in data:
-                results.append(data)
-            for v in data.values():
-                if isinstance(v, (list, dict)):
-                    results.extend(self._find_images(v, depth+1))
+        visited = set()
+        # Explicit stack instead of recursion. Entries are (node, depth, is_image);
+        # children go on in reverse so they pop in their original order.
+        stack = [(data, 0, False)]
+        while stack:
+            node, depth, is_image = stack.pop()
+            if is_image:
+                results.append(node)
+                continue
+            if depth > 8 or id(node) in visited:
+                continue
+            visited.add(id(node))
+            if isinstance(node, list):
+                for item in reversed(node):
+                    if isinstance(item, dict) and any(k in item for k in ['response_id', 'url', 'thumbnail_url']):
+                        stack.append((item, depth, True))
+                    elif isinstance(item, (list, dict)):
+                        stack.append((item, depth + 1, False))
+            elif isinstance(node, dict):
+                if 'response_id' in node and 'prompt' in node:
+                    results.append(node)
+                for v in reversed(node.values()):
+                    if isinstance(v, (list, dict)):
+                        stack.append((v, depth + 1, False))
         return results
 
-    def extract_all_images(self):
-        """Deduplicate all captured images."""
-        seen = set()
-        for resp in self.api_responses:
-            for img in self._find_images(resp['data']):
-                rid = img.get('response_id') or img.get('id') or id(img)
-                if rid not in seen:
-                    seen.add(rid)
-                    self.all_image_data.append(img)
-        return self.all_image_data
+    async def _wait_for_images(self, timeout):
+        """Wait until on_response captures image data; returns False if `timeout` seconds pass first."""
+        try:
+            await asyncio.wait_for(self.images_captured.wait(), timeout)
+            return True
+        except TimeoutError:
+            return False
+
+    async def _goto(self, page, url, timeout=PAGE_TIMEOUT):
+        """Navigate to `url` and return as soon as its first image API response has been captured."""
+        self.images_captured.clear()
+        try:
+            await page.goto(url, timeout=timeout * 1000)
+        except Exception:
+            pass
+        return await self._wait_for_images(timeout)
 
     async def scroll_and_capture(self, page, max_scrolls=100):
         """Scroll down to trigger loading of all images."""
         print("\n🔄 Scrolling to load all images...")
-        prev_count = 0
-        stale = 0
-        
-        for i in range(max_scrolls):
-            await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await asyncio.sleep(1.5)
-            
-            cur = sum(len(self._find_images(r['data'])) for r in self.api_responses)
-            if cur == prev_count:
-                stale += 1
-                if stale >= 5:
-                    print(f"  No new images after {stale} scrolls. Done loading.")
-                    break
-            else:
-                stale = 0
-                print(f"  Scroll {i+1}: {cur} images found so far")
-            prev_count = cur
+        # on_response keeps capturing the API pages while the in-page scroller runs
+        try:
+            scrolls = await page.evaluate(SCROLL_ALL_JS, [SCROLL_PAUSE_MS, SCROLL_IDLE_LIMIT, max_scrolls])
+            print(f"  Done loading after {scrolls} scrolls: {len(self.all_image_data)} images found")
+        except Exception as e:
+            print(f"  Scrolling stopped early ({e}): {len(self.all_image_data)} images found")
         
-        return self.extract_all_images()
+        return self.all_image_data
 
     async def download_images(self, page, images):
-        """Download all images using browser context."""
+        """Download all images using browser context, several at a time."""
         print(f"\n📥 Downloading {len(images)} images to {self.output_dir}/")
         
-        success = 0
-        failed = 0
+        cookies = await page.context.cookies('https://ideogram.ai')
+        user_agent = await page.evaluate('navigator.userAgent')
+        if self.processes > 1:
+            if USE_AIOHTTP:
+                return await self._download_sharded(page, images, cookies, user_agent)
+            print("  ⚠️ --processes needs aiohttp installed; downloading in this process")
+        return await self._download_batch(page, list(enumerate(images)), cookies, user_agent)
+
+    async def _download_sharded(self, page, images, cookies, user_agent):
+        """Split the downloads across worker processes, each with its own aiohttp session."""
+        n = self.processes
+        indexed = list(enumerate(images))
+        shards = [indexed[k::n] for k in range(n)]
+        print(f"  Using {n} processes, {self.max_rate / n:g} requests/s each")
         
-        for i, img in enumerate(images):
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, download_shard, shard, cookies, user_agent, self.output_dir,
+                                     self.max_rate / n, self.max_concurrency, self.force)
+                for shard in shards
+            ))
+        success = sum(ok for ok, _, _ in results)
+        failed = sum(fail for _, fail, _ in results)
+        # Workers have no page to fall back to, so retry Cloudflare's 403s here through the browser
+        forbidden = sorted(i for _, _, blocked in results for i in blocked)
+        if forbidden:
+            print(f"  🔁 Retrying {len(forbidden)} images Cloudflare refused (HTTP 403) through the browser...")
+            ok, fail = await self._download_batch(page, [(i, images[i]) for i in forbidden], cookies, user_agent)
+            success += ok
+            failed += fail - len(forbidden)
+        return success, failed
+
+    async def _download_batch(self, page, indexed, cookies, user_agent):
+        """Download (index, image) pairs concurrently; `page` is None inside a worker process."""
+        self.success = 0
+        self.failed = 0
+        self.forbidden = []
+        # Skip images an earlier run already finished, unless --force
+        out_dir = Path(self.output_dir)
+        self.done = {} if self.force else load_manifest(out_dir)
+        self.taken = {Path(f).stem for f in self.done.values()}
+        skipped = sum(1 for _, img in indexed if (img.get('response_id') or img.get('id')) in self.done)
+        if skipped:
+            print(f"  Skipping {skipped} images already downloaded (use --force to fetch them again)")
+        
+        self._open_http(cookies, user_agent)
+        stop = asyncio.Event()
+        reporter = asyncio.create_task(self._report_progress(len(indexed), stop))
+        try:
+            # Line-buffered so every finished download is recorded even if we're interrupted
+            with open(out_dir / MANIFEST_NAME, 'a', buffering=1) as self.manifest:
+                async with asyncio.TaskGroup() as tg:
+                    for i, img in indexed:
+                        tg.create_task(self._fetch_one(page, img, i))
+        finally:
+            self.manifest = None
+            stop.set()
+            await reporter
+            await self._close_http()
+        
+        return self.success, self.failed
+
+    async def _fetch_one(self, page, img, i):
+        """Download one image, holding a semaphore slot for the request and write."""
+        async with self.sem:
+            ok = await self._download_one(page, img, i)
+        if ok:
+            self.success += 1
+        else:
+            self.failed += 1
+
+    async def _report_progress(self, total, stop):
+        """Print download progress every PROGRESS_INTERVAL seconds until `stop` is set."""
+        last = 0
+        while not stop.is_set():
             try:
-                rid = img.get('response_id') or img.get('id')
-                url = None
-                
-                if rid:
-                    url = f"https://ideogram.ai/api/images/direct/{rid}"
-                if not url:
-                    url = img.get('url') or img.get('image_url') or img.get('thumbnail_url')
-                if not url:
-                    failed += 1
-                    continue
-                
-                resp = await page.request.get(url)
-                if resp.status != 200:
-                    # Fallback to thumbnail
-                    thumb = img.get('thumbnail_url')
-                    if thumb:
-                        resp = await page.request.get(thumb)
-                
-                if resp.status != 200:
-                    print(f"  ❌ {i:04d}: HTTP {resp.status}")
-                    failed += 1
-                    continue
-                
-                body = await resp.body()
-                ct = resp.headers.get('content-type', 'image/png')
-                ext = 'jpg' if 'jpeg' in ct or 'jpg' in ct else 'webp' if 'webp' in ct else 'png'
-                
-                prompt = img.get('prompt', 'untitled')
-                safe = re.sub(r'[^\w\s-]', '', prompt[:60]).strip().replace(' ', '_')
-                fname = f"{i:04d}_{safe}.{ext}"
-                
-                with open(os.path.join(self.output_dir, fname), 'wb') as f:
-                    f.write(body)
+                await asyncio.wait_for(stop.wait(), PROGRESS_INTERVAL)
+            except TimeoutError:
+                pass
+            done = self.success + self.failed
+            if done != last:
+                print(f"  Progress: {done}/{total} ({self.success} OK, {self.failed} failed)")
+                last = done
+
+    async def _get(self, page, url):
+        """GET an image, rate limited and retried with backoff on 429."""
+        delay = 1
+        for attempt in range(MAX_RETRIES + 1):
+            async with self.limiter:
+                resp = await self._send(page, url)
+            if resp.status != 429 or attempt == MAX_RETRIES:
+                return resp
+            await self._discard(resp)
+            try:
+                wait = float(resp.headers.get('retry-after', ''))
+            except ValueError:
+                wait = delay
+            await asyncio.sleep(min(wait, MAX_BACKOFF))
+            delay = min(delay * 2, MAX_BACKOFF)
+
+    def _open_http(self, cookies, user_agent):
+        """Open a keep-alive aiohttp session carrying the browser's ideogram.ai cookies."""
+        if not USE_AIOHTTP:
+            return
+        jar = aiohttp.CookieJar()
+        jar.update_cookies({c['name']: c['value'] for c in cookies}, response_url=URL('https://ideogram.ai'))
+        self.http = aiohttp.ClientSession(
+            cookie_jar=jar,
+            connector=aiohttp.TCPConnector(limit_per_host=self.max_concurrency, keepalive_timeout=30),
+            headers={'User-Agent': user_agent, 'Referer': 'https://ideogram.ai/'},
+        )
+
+    async def _close_http(self):
+        """Close the aiohttp session, if one was opened."""
+        if self.http:
+            await self.http.close()
+            self.http = None
+
+    async def _send(self, page, url):
+        """Send one GET, over aiohttp when possible and through the browser otherwise."""
+        if self.http and not self.http_blocked:
+            resp = await self.http.get(url)
+            if resp.status != 403 or page is None:
+                return resp
+            resp.release()
+            if resp.headers.get('cf-mitigated') == 'challenge' and not self.http_blocked:
+                # Cloudflare wants a real browser; send everything through Playwright from now on
+                print("  ⚠️ Cloudflare challenged the direct session, using the browser for downloads")
+                self.http_blocked = True
+        return await page.request.get(url)
+
+    async def _discard(self, resp):
+        """Release a response without reading its body."""
+        if USE_AIOHTTP and isinstance(resp, aiohttp.ClientResponse):
+            resp.release()
+        else:
+            await resp.dispose()
+
+    async def _save(self, resp, stem):
+        """Write a response body to `<stem>.<ext>` off the event loop; returns (filename, bytes written)."""
+        loop = asyncio.get_running_loop()
+        mime = resp.headers.get('content-type', '').split(';', 1)[0].strip().lower()
+        ext = EXT_BY_MIME.get(mime)
+        if not (USE_AIOHTTP and isinstance(resp, aiohttp.ClientResponse)):
+            body = await resp.body()
+            # Playwright holds fetched bodies in the driver until the context closes
+            await resp.dispose()
+            filename = f"{stem}.{ext or sniff_extension(body)}"
+            path = Path(self.output_dir) / filename
+            await loop.run_in_executor(self._io_pool, path.write_bytes, body)
+            return filename, len(body)
+        # Stream from aiohttp so only one chunk per download is ever in memory
+        try:
+            chunks = resp.content.iter_chunked(CHUNK_SIZE)
+            head = await anext(chunks, b'')
+            filename = f"{stem}.{ext or sniff_extension(head)}"
+            path = Path(self.output_dir) / filename
+            f = await loop.run_in_executor(self._io_pool, open, path, 'wb')
+            complete = False
+            try:
+                await loop.run_in_executor(self._io_pool, f.write, head)
+                size = len(head)
+                async for chunk in chunks:
+                    await loop.run_in_executor(self._io_pool, f.write, chunk)
+                    size += len(chunk)
+                complete = True
+            finally:
+                await loop.run_in_executor(self._io_pool, f.close)
+                if not complete:
+                    # Don't leave a truncated image behind when the stream fails part-way
+                    await loop.run_in_executor(self._io_pool, lambda: path.unlink(missing_ok=True))
+        finally:
+            resp.release()
+        return filename, size
+
+    async def _download_one(self, page, img, i):
+        """Fetch a single image and write it to disk; returns True on success."""
+        try:
+            rid = img.get('response_id') or img.get('id')
+            if rid in self.done:
+                return True
+            url = None
+            
+            if rid:
+                url = f"https://ideogram.ai/api/images/direct/{rid}"
+            if not url:
+                url = img.get('url') or img.get('image_url') or img.get('thumbnail_url')
+            if not url:
+                return False
+            
+            resp = await self._get(page, url)
+            if resp.status == 403 and page is None:
+                # A worker can't get past Cloudflare; leave the full-res image to the parent's browser retry
+                self.forbidden.append(i)
+                await self._discard(resp)
+                return False
+            if resp.status != 200:
+                # Fallback to thumbnail
+                thumb = img.get('thumbnail_url')
+                if thumb:
+                    await self._discard(resp)
+                    resp = await self._get(page, thumb)
+            
+            if resp.status != 200:
+                print(f"  ❌ {i:04d}: HTTP {resp.status}")
+                await self._discard(resp)
+                return False
+            
+            prompt = img.get('prompt', 'untitled')
+            safe = UNSAFE_CHARS_RE.sub('', prompt[:60]).strip().replace(' ', '_')
+            stem = f"{i:04d}_{safe}"
+            # A reroll that shifted into an old index can collide with a file the manifest credits to another image
+            if stem in self.taken:
+                stem = f"{stem}_{rid or 'new'}"
+            fname, _ = await self._save(resp, stem)
+            if rid and self.manifest:
+                self.manifest.write(json.dumps({'id': rid, 'file': fname}) + '\n')
+            
+            return True
                 
-                success += 1
-                if (i+1) % 20 == 0:
-                    print(f"  Progress: {i+1}/{len(images)} ({success} OK, {failed} failed)")
-                    await asyncio.sleep(0.5)
-                    
-            except Exception as e:
-                print(f"  ❌ {i:04d}: {e}")
-                failed += 1
-        
-        return success, failed
+        except Exception as e:
+            print(f"  ❌ {i:04d}: {e}")
+            return False
 
     async def run_headed(self, session_cookie=None):
         """Run with a visible browser window."""
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=False)
-            context = await browser.new_context(viewport={'width': 1920, 'height': 1080})
+            state = Path(self.output_dir) / STATE_NAME
+            restored = state.exists()
+            context = await browser.new_context(viewport={'width': 1920, 'height': 1080},
+                                                storage_state=str(state) if restored else None)
+            if restored:
+                print(f"🔑 Reusing the browser session saved in {state}")
             
             if session_cookie:
                 await context.add_cookies([{
@@ -196,9 +538,8 @@ class IdeogramDownloader:
             
             print("🌐 Opening ideogram.ai...")
             await page.goto('https://ideogram.ai')
-            await asyncio.sleep(5)
             
-            if not session_cookie:
+            if not session_cookie and not restored:
                 print("\n⚡ Please log in to ideogram.ai in the browser window!")
                 print("   Press Enter here once you're logged in and on your profile page...")
                 await asyncio.to_thread(input)
@@ -207,19 +548,11 @@ class IdeogramDownloader:
             print("📌 Navigating to your creations...")
             
             # Try clicking profile or my-images
-            try:
-                await page.goto('https://ideogram.ai/my-images', wait_until='networkidle', timeout=15000)
-            except:
-                pass
-            await asyncio.sleep(3)
+            await self._goto(page, 'https://ideogram.ai/my-images')
             
             # If no API responses yet, the URL might differ
-            if not self.api_responses:
-                try:
-                    await page.goto('https://ideogram.ai/assets', wait_until='networkidle', timeout=15000)
-                except:
-                    pass
-                await asyncio.sleep(3)
+            if not self.api_response_urls:
+                await self._goto(page, 'https://ideogram.ai/assets')
             
             # Scroll to load everything
             images = await self.scroll_and_capture(page)
@@ -227,9 +560,9 @@ class IdeogramDownloader:
             if images:
                 # Save metadata
                 meta = os.path.join(self.output_dir, 'metadata.json')
-                with open(meta, 'w') as f:
-                    json.dump(images, f, indent=2, default=str)
+                Path(meta).write_bytes(dump_json(images))
                 print(f"\n📄 Saved metadata: {meta}")
+                await self._save_state(context)
                 
                 # Download
                 ok, fail = await self.download_images(page, images)
@@ -242,15 +575,22 @@ class IdeogramDownloader:
                 await asyncio.to_thread(input)
                 images = await self.scroll_and_capture(page)
                 if images:
+                    await self._save_state(context)
                     ok, fail = await self.download_images(page, images)
                     print(f"✅ Done! {ok} downloaded, {fail} failed")
             
             # Save all API data for debugging
-            with open(os.path.join(self.output_dir, 'api_debug.json'), 'w') as f:
-                json.dump([{'url': r['url']} for r in self.api_responses], f, indent=2)
+            debug = Path(self.output_dir) / 'api_debug.json'
+            debug.write_bytes(dump_json(list(self.api_response_urls)))
             
             await browser.close()
 
+    async def _save_state(self, context):
+        """Save cookies and local storage so the next run can skip login and the Cloudflare check."""
+        path = Path(self.output_dir) / STATE_NAME
+        await context.storage_state(path=str(path))
+        path.chmod(0o600)  # it holds the login session
+
     async def run_chrome_profile(self):
         """Run using the user's existing Chrome profile."""
         # Find Chrome user data directory
@@ -286,14 +626,12 @@ class IdeogramDownloader:
             page.on('response', self.on_response)
             
             print("🌐 Loading ideogram.ai with your Chrome session...")
-            await page.goto('https://ideogram.ai/my-images', wait_until='networkidle', timeout=30000)
-            await asyncio.sleep(5)
+            await self._goto(page, 'https://ideogram.ai/my-images', timeout=30)
             
             images = await self.scroll_and_capture(page)
             
             if images:
-                with open(os.path.join(self.output_dir, 'metadata.json'), 'w') as f:
-                    json.dump(images, f, indent=2, default=str)
+                (Path(self.output_dir) / 'metadata.json').write_bytes(dump_json(images))
                 ok, fail = await self.download_images(page, images)
                 print(f"\n✅ Done! {ok} downloaded, {fail} failed")
                 print(f"📁 Output: {os.path.abspath(self.output_dir)}")
@@ -301,6 +639,13 @@ class IdeogramDownloader:
             await context.close()
 
 
+def download_shard(shard, cookies, user_agent, output_dir, max_rate, max_concurrency, force):
+    """Worker-process entry point for --processes: download (index, image) pairs over aiohttp."""
+    dl = IdeogramDownloader(output_dir, max_rate, max_concurrency, force)
+    success, failed = asyncio.run(dl._download_batch(None, shard, cookies, user_agent))
+    return success, failed, dl.forbidden
+
+
 async def main():
     import argparse
     parser = argparse.ArgumentParser()
@@ -308,9 +653,18 @@ async def main():
     parser.add_argument('--chrome-profile', action='store_true', help='Use your existing Chrome profile')
     parser.add_argument('--session-cookie', '-s', help='Session cookie value')
     parser.add_argument('--output', '-o', default='./ideogram_images', help='Output directory')
+    parser.add_argument('--max-rate', type=float, default=MAX_RATE,
+                        help=f'Max requests per second to ideogram.ai (default: {MAX_RATE})')
+    parser.add_argument('--max-concurrency', type=int, default=DOWNLOAD_CONCURRENCY,
+                        help=f'Max parallel image downloads (default: {DOWNLOAD_CONCURRENCY})')
+    parser.add_argument('--force', action='store_true',
+                        help='Download every image again, even ones a previous run finished')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Split downloads across N processes for very large galleries (needs aiohttp; '
+                             '--max-rate is shared between them)')
     args = parser.parse_args()
     
-    dl = IdeogramDownloader(args.output)
+    dl = IdeogramDownloader(args.output, args.max_rate, args.max_concurrency, args.force, args.processes)
     
     if args.chrome_profile:
         await dl.run_chrome_profile()
@@ -7,36 +7,118 @@ Injects API interceptor via CDP before page load.
 
 SETUP:
   pip install undetected-chromedriver selenium setuptools
+  (requests comes in with undetected-chromedriver)
+  Optional: pip install aiohttp  (downloads many images at once on a single thread)
+  Optional: pip install orjson   (faster JSON for the captured API data)
 
 USAGE:
-  python3 download_stealth.py
+  python3 download_stealth.py [--force] [--url GALLERY_URL ...]
 """
 
+import asyncio
 import base64
 import json
 import os
+import queue
+import random
 import re
+import shutil
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
+from urllib.parse import urlsplit
 
 try:
+    import requests
     import undetected_chromedriver as uc
+    import urllib3
     from selenium.webdriver.common.by import By
 except ImportError:
     print("Install dependencies first:")
     print("  pip install undetected-chromedriver selenium setuptools")
     sys.exit(1)
 
+try:
+    import aiohttp
+    from yarl import URL
+    USE_AIOHTTP = True
+except ImportError:
+    USE_AIOHTTP = False
+
+try:
+    import orjson
+    USE_ORJSON = True
+except ImportError:
+    USE_ORJSON = False
+
+DOWNLOAD_WORKERS = 8  # parallel image downloads over plain HTTP (requests fallback)
+ASYNC_CONCURRENCY = 32  # simultaneous image downloads with aiohttp
+REQUEST_TIMEOUT = 30  # seconds
+MAX_RETRIES = 3  # extra attempts per image after a 429 or 5xx
+MAX_BACKOFF = 30  # seconds; cap on any single wait between retries
+CHUNK_SIZE = 64 * 1024  # bytes per read when streaming an image to disk
+MIN_IMAGE_SIZE = 1000  # bytes; anything smaller is an error page or a broken file
+WRITE_QUEUE_SIZE = 64  # chunks waiting for the disk writer before downloads block
+COMMAND_POOL_SIZE = 4  # keep-alive connections to chromedriver (main thread + uc's CDP event reactor)
+MANIFEST_NAME = "manifest.jsonl"  # one {"id", "file"} line per finished download, for resuming
+UNSAFE_CHARS_RE = re.compile(r'[^\w\s-]')
+URL_TOKEN_RE = re.compile(r'[\w-]+')  # path segments/params that may carry a response_id
+SIZE_PARAMS_RE = re.compile(r'[?&](?:w|h|width|height|size|quality)=[^&]*')
+THUMB_TAGS = ('thumbnail', '_thumb', 'small')  # URL fragments marking a downscaled copy
+URL_KEYS = ('url', 'image_url', 'src', 'thumbnail_url')
+SCROLL_PAUSE = 0.3  # seconds between scroll steps
+API_IDLE_TIMEOUT = 2.0  # stop scrolling once no image-listing API response has arrived for this long
+MAX_SCROLLS = 2000  # hard stop for the scroll loop, whatever the page keeps fetching
+# API paths that list images; the interceptor keeps only responses under these
+IMAGE_API_PREFIXES = (
+    '/api/g/', '/api/images/', '/api/gallery/', '/api/u/', '/api/user/', '/api/users/',
+    '/api/creations/', '/api/profile/',
+)
+GALLERY_URL = "https://ideogram.ai/t/my-images"
+CHROME_VERSION_CACHE = Path.home() / '.cache' / 'ideogram-dl' / 'chrome_version.json'
+
+
+def load_json(content):
+    """Parse JSON text or bytes, using orjson when it's installed."""
+    if USE_ORJSON:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def dump_json(obj):
+    """Serialise `obj` to indented JSON bytes, using orjson when it's installed."""
+    if USE_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str)
+    return json.dumps(obj, indent=2, default=str).encode()
+
 
 def detect_chrome_version():
-    """Auto-detect installed Chrome/Chromium version."""
+    """Auto-detect installed Chrome/Chromium version, cached until the binary changes."""
+    try:
+        cached = json.loads(CHROME_VERSION_CACHE.read_text())
+    except (OSError, ValueError):
+        cached = {}
     for chrome_bin in ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser',
                        '/usr/bin/google-chrome', '/usr/bin/chromium']:
+        path = shutil.which(chrome_bin)  # skip missing candidates without spawning them
+        if not path:
+            continue
         try:
-            out = subprocess.check_output([chrome_bin, '--version'], text=True, stderr=subprocess.DEVNULL).strip()
-            ver = int(out.split()[-1].split('.')[0])
+            mtime = os.stat(path).st_mtime
+            if cached.get('path') == path and cached.get('mtime') == mtime:
+                ver = cached['version']
+            else:
+                out = subprocess.check_output([path, '--version'], text=True, stderr=subprocess.DEVNULL).strip()
+                ver = int(out.split()[-1].split('.')[0])
+                try:
+                    CHROME_VERSION_CACHE.parent.mkdir(parents=True, exist_ok=True)
+                    CHROME_VERSION_CACHE.write_text(json.dumps({'path': path, 'mtime': mtime, 'version': ver}))
+                except OSError:
+                    pass
             print(f"   Detected {chrome_bin} → version {ver}")
             return ver
         except Exception:
@@ -47,21 +129,38 @@ def detect_chrome_version():
 # JavaScript interceptor to inject via CDP (runs before any page JS)
 INTERCEPTOR_JS = """
 (function() {
-    window.__ideo_captured = [];
+    const IMAGE_API_PREFIXES = __IMAGE_API_PREFIXES__;
+    window.__ideo_captured = [];  // drained by Python as it scrolls
+    window.__ideo_total = 0;      // running count, unaffected by draining
     window.__ideo_img_urls = new Set();
     
+    // Only image-listing endpoints are worth keeping; analytics, feature flags
+    // etc. are skipped before their bodies are even read
+    function isImageApi(url) {
+        try {
+            const path = new URL(url, location.href).pathname;
+            return IMAGE_API_PREFIXES.some(p => path.startsWith(p));
+        } catch(e) {
+            return false;
+        }
+    }
+    
+    function capture(url, data) {
+        window.__ideo_captured.push({url: url, data: data, ts: Date.now()});
+        window.__ideo_total++;
+    }
+    
     // Intercept fetch
     const origFetch = window.fetch;
     window.fetch = async function(...args) {
         const response = await origFetch.apply(this, args);
-        const url = typeof args[0] === 'string' ? args[0] : args[0]?.url || '';
-        if (response.ok) {
+        const url = typeof args[0] === 'string' ? args[0] : args[0]?.url || String(args[0] || '');
+        if (response.ok && isImageApi(url)) {
             try {
                 const clone = response.clone();
                 const text = await clone.text();
                 try {
-                    const data = JSON.parse(text);
-                    window.__ideo_captured.push({url: url, data: data, ts: Date.now()});
+                    capture(url, JSON.parse(text));
                 } catch(e) {
                     // Not JSON, skip
                 }
@@ -79,10 +178,9 @@ INTERCEPTOR_JS = """
     };
     XMLHttpRequest.prototype.send = function(...args) {
         this.addEventListener('load', function() {
-            if (this.__url && this.status >= 200 && this.status < 300) {
+            if (this.__url && this.status >= 200 && this.status < 300 && isImageApi(this.__url)) {
                 try {
-                    const data = JSON.parse(this.responseText);
-                    window.__ideo_captured.push({url: this.__url, data: data, ts: Date.now()});
+                    capture(this.__url, JSON.parse(this.responseText));
                 } catch(e) {}
             }
         });
@@ -91,10 +189,102 @@ INTERCEPTOR_JS = """
     
     console.log('[ideogram-dl] API interceptor installed');
 })();
+""".replace('__IMAGE_API_PREFIXES__', json.dumps(IMAGE_API_PREFIXES))
+
+# Hand over the API responses captured since the last call and clear the in-page buffer
+DRAIN_JS = """
+var captured = window.__ideo_captured || [];
+return JSON.stringify(captured.splice(0, captured.length));
+"""
+
+# One scroll step in a single CDP round-trip: report what the last step loaded
+# ([scrollHeight, API calls captured, <img> count, newly captured responses as JSON]),
+# then scroll the page and its inner scroll containers to the bottom.
+SCROLL_JS = """
+var captured = window.__ideo_captured || [];
+var stats = [
+    document.body.scrollHeight,
+    window.__ideo_total || 0,
+    document.querySelectorAll('img').length,
+    JSON.stringify(captured.splice(0, captured.length))
+];
+window.scrollTo(0, document.body.scrollHeight);
+document.querySelectorAll('[class*="scroll"], [class*="grid"], main, [role="main"]').forEach(function(c) {
+    c.scrollTop = c.scrollHeight;
+});
+return stats;
 """
 
 
+def widen_command_pool(driver):
+    """Let WebDriver keep several connections to chromedriver alive instead of one."""
+    # Selenium's default urllib3 pool holds a single connection, so whenever the CDP
+    # reactor thread and the main thread overlap, one of them opens a fresh socket
+    # and later throws it away ("Connection pool is full, discarding connection").
+    conn = getattr(driver.command_executor, '_conn', None)
+    if type(conn) is not urllib3.PoolManager:
+        return  # keep-alive off, or going through a proxy
+    pool_kw = dict(conn.connection_pool_kw, maxsize=COMMAND_POOL_SIZE, block=True)
+    driver.command_executor._conn = urllib3.PoolManager(**pool_kw)
+    conn.clear()
+
+
+def open_gallery(driver, url, new_tab=False):
+    """Load a gallery page (in a new tab if asked) with the API interceptor running; returns its window handle."""
+    if new_tab:
+        driver.switch_to.new_window('tab')
+        # CDP setup is per tab, so the new one needs the interceptor installed too
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": INTERCEPTOR_JS})
+        driver.execute_cdp_cmd("Network.enable", {})
+    driver.get(url)
+    time.sleep(5)
+    
+    # Check if interceptor is alive
+    alive = driver.execute_script("return typeof window.__ideo_captured !== 'undefined'")
+    captured_so_far = driver.execute_script("return window.__ideo_captured ? window.__ideo_total : -1")
+    print(f"   {url} — interceptor active: {alive}, captured so far: {captured_so_far}")
+    
+    if not alive:
+        print("   ⚠️ Interceptor lost after navigation. Re-injecting...")
+        driver.execute_script(INTERCEPTOR_JS)
+        driver.refresh()
+        time.sleep(5)
+    return driver.current_window_handle
+
+
+def load_manifest(output_dir):
+    """Map image id -> filename for downloads recorded in the manifest that are still on disk."""
+    # One directory scan up front keeps the per-image check a dict lookup
+    existing = {
+        entry.name for entry in os.scandir(output_dir)
+        if entry.is_file() and entry.stat().st_size > MIN_IMAGE_SIZE
+    }
+    done = {}
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted run
+                if record.get("file") in existing:
+                    done[record["id"]] = record["file"]
+    except FileNotFoundError:
+        pass
+    return done
+
+
 def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Download all Ideogram images with undetected Chrome")
+    parser.add_argument('--force', action='store_true',
+                        help='Download every image again, even ones a previous run finished')
+    parser.add_argument('--url', action='append',
+                        help=f'Gallery page to scroll (default: {GALLERY_URL}); repeat to scroll '
+                             'several pages (e.g. different albums) side by side in separate tabs')
+    args = parser.parse_args()
+    urls = args.url or [GALLERY_URL]
+    
     output_dir = "./ideogram_images"
     Path(output_dir).mkdir(parents=True, exist_ok=True)
 
@@ -106,18 +296,39 @@ def main():
     print("\n🌐 Launching Chrome (undetected mode)...")
     options = uc.ChromeOptions()
     options.add_argument("--window-size=1920,1080")
+    # Trim Chrome's own background work; images still have to render for the DOM scrape
+    options.add_argument("--disable-features=MediaRouter,Translate")
+    options.add_argument("--disable-background-networking")
+    options.add_argument("--disable-gpu-compositing")
+    if len(urls) > 1:
+        # Background tabs must keep loading while another tab is being scrolled
+        options.add_argument("--disable-background-timer-throttling")
+        options.add_argument("--disable-backgrounding-occluded-windows")
+        options.add_argument("--disable-renderer-backgrounding")
     
     chrome_ver = detect_chrome_version()
     if chrome_ver:
         print(f"   Using Chrome version: {chrome_ver}")
     
-    driver = uc.Chrome(options=options, version_main=chrome_ver)
+    driver = uc.Chrome(options=options, version_main=chrome_ver, enable_cdp_events=True)
+    widen_command_pool(driver)
     
     try:
         # Inject interceptor via CDP — runs on every new document before page JS
         print("📡 Installing API interceptor (CDP)...")
         driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": INTERCEPTOR_JS})
         
+        # Track when the page last got an image-listing API response, so scrolling can stop as
+        # soon as it goes quiet; analytics or polling elsewhere under /api/ must not keep it going
+        last_api_response = [time.time()]
+        
+        def on_response(message):
+            if urlsplit(message['params']['response']['url']).path.startswith(IMAGE_API_PREFIXES):
+                last_api_response[0] = time.time()
+        
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.add_cdp_listener("Network.responseReceived", on_response)
+        
         # Navigate to ideogram
         print("📌 Opening ideogram.ai...")
         driver.get("https://ideogram.ai")
@@ -126,61 +337,62 @@ def main():
         print("   Once you're logged in and can see ideogram.ai, press Enter here...")
         input()
         
-        # Navigate to my-images (interceptor will capture the API calls)
+        # Open each gallery page in its own tab (interceptor will capture the API calls);
+        # every tab has its own window.__ideo_captured
         print("   Navigating to your creations page...")
-        driver.get("https://ideogram.ai/t/my-images")
-        time.sleep(5)
-        
-        # Check if interceptor is alive
-        alive = driver.execute_script("return typeof window.__ideo_captured !== 'undefined'")
-        captured_so_far = driver.execute_script("return window.__ideo_captured ? window.__ideo_captured.length : -1")
-        print(f"   Interceptor active: {alive}, captured so far: {captured_so_far}")
+        tabs = [open_gallery(driver, url, new_tab=k > 0) for k, url in enumerate(urls)]
         
-        if not alive:
-            print("   ⚠️ Interceptor lost after navigation. Re-injecting...")
-            driver.execute_script(INTERCEPTOR_JS)
-            driver.refresh()
-            time.sleep(5)
-        
-        # Scroll to load ALL images
-        print("\n🔄 Scrolling to load all images (this may take a while)...")
-        last_height = 0
-        stale_count = 0
+        # Scroll to load ALL images. WebDriver isn't thread-safe, so the tabs are
+        # scrolled round-robin from this thread while the others keep loading.
+        print(f"\n🔄 Scrolling to load all images in {len(tabs)} tab(s) (this may take a while)...")
+        api_data = []
+        all_images = []
+        seen_ids = set()
+        heights = dict.fromkeys(tabs, 0)
         scroll_num = 0
+        last_api_response[0] = time.time()
+        active = dict.fromkeys(tabs, last_api_response[0])  # tab -> when it last loaded something
         
-        while stale_count < 8:  # More patience
+        # Keep scrolling each tab while the page is still fetching from the API (or still growing)
+        while active:
+            if scroll_num >= MAX_SCROLLS:
+                print(f"   ⚠️ Stopped after {MAX_SCROLLS} scrolls; the page was still loading")
+                break
             scroll_num += 1
+            for k, handle in enumerate(tabs, 1):
+                if handle not in active:
+                    continue
+                label = f"[tab {k}] " if len(tabs) > 1 else ""
+                if len(tabs) > 1:
+                    driver.switch_to.window(handle)
+                
+                # Read the page state left by the previous scroll, then scroll again
+                # and pull images out of the new responses while the page loads more
+                new_height, captured_count, img_count, batch = driver.execute_script(SCROLL_JS)
+                batch = load_json(batch)
+                api_data.extend(batch)
+                added = add_images(batch, all_images, seen_ids)
+                now = time.time()
+                if new_height != heights[handle] or batch:
+                    active[handle] = now
+                    heights[handle] = new_height
+                if added or scroll_num % 10 == 0:
+                    print(f"   {label}Scroll {scroll_num}: +{added} images, {len(all_images)} total | "
+                          f"{captured_count} API calls | {img_count} imgs in DOM")
+                if now - max(active[handle], last_api_response[0]) >= API_IDLE_TIMEOUT:
+                    del active[handle]
+                    print(f"   {label}No new API responses for {API_IDLE_TIMEOUT:.0f}s — done after {scroll_num} scrolls")
             
-            # Scroll to bottom
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1.5)
-            
-            # Also try scrolling the main content container
-            driver.execute_script("""
-                var containers = document.querySelectorAll('[class*="scroll"], [class*="grid"], main, [role="main"]');
-                containers.forEach(function(c) {
-                    c.scrollTop = c.scrollHeight;
-                });
-            """)
-            time.sleep(1)
-            
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            captured_count = driver.execute_script("return window.__ideo_captured ? window.__ideo_captured.length : 0")
-            img_count = driver.execute_script("return document.querySelectorAll('img').length")
-            
-            if new_height == last_height:
-                stale_count += 1
-                print(f"   Scroll {scroll_num}: stale ({stale_count}/8) | {captured_count} API calls | {img_count} imgs in DOM")
-            else:
-                stale_count = 0
-                print(f"   Scroll {scroll_num}: loading... | {captured_count} API calls | {img_count} imgs in DOM")
-            
-            last_height = new_height
+            time.sleep(SCROLL_PAUSE)
         
-        # Extract captured API data
+        # Pick up anything captured after the last scroll step
         print("\n📦 Extracting captured API data...")
-        captured = driver.execute_script("return JSON.stringify(window.__ideo_captured || [])")
-        api_data = json.loads(captured)
+        for handle in tabs:
+            if len(tabs) > 1:
+                driver.switch_to.window(handle)
+            batch = load_json(driver.execute_script(DRAIN_JS))
+            api_data.extend(batch)
+            add_images(batch, all_images, seen_ids)
         print(f"   Total API responses captured: {len(api_data)}")
         
         if api_data:
@@ -193,40 +405,28 @@ def main():
                 print(f"     - {ep}")
         
         # Save raw API data
-        with open(os.path.join(output_dir, "api_raw.json"), "w") as f:
-            json.dump(api_data, f, indent=2, default=str)
-        
-        # Find images from API data
-        all_images = []
-        seen_ids = set()
-        
-        for resp in api_data:
-            images = find_images_recursive(resp.get('data', {}))
-            for img in images:
-                rid = img.get('response_id') or img.get('id')
-                if rid and rid not in seen_ids:
-                    seen_ids.add(rid)
-                    all_images.append(img)
+        with open(os.path.join(output_dir, "api_raw.json"), "wb") as f:
+            f.write(dump_json(api_data))
         
         print(f"   Images from API: {len(all_images)}")
         
         # Also scrape DOM for any images the API might have missed
         print("\n🔍 Scraping page DOM for image URLs...")
-        dom_images = scrape_all_images(driver)
+        dom_images = []
+        seen_urls = set()
+        for handle in tabs:
+            if len(tabs) > 1:
+                driver.switch_to.window(handle)
+            for di in scrape_all_images(driver):
+                if di.get('url') not in seen_urls:
+                    seen_urls.add(di.get('url'))
+                    dom_images.append(di)
         print(f"   Images from DOM: {len(dom_images)}")
         
         # Merge: prefer API data, supplement with DOM
-        dom_only = []
-        for di in dom_images:
-            url = di.get('url', '')
-            # Check if we already have this from API
-            already_have = False
-            for ai in all_images:
-                if ai.get('response_id') and ai['response_id'] in url:
-                    already_have = True
-                    break
-            if not already_have:
-                dom_only.append(di)
+        api_rids = {ai['response_id'] for ai in all_images if ai.get('response_id')}
+        dom_only = [di for di in dom_images
+                    if api_rids.isdisjoint(URL_TOKEN_RE.findall(di.get('url', '')))]
         
         if dom_only:
             print(f"   Additional images from DOM not in API: {len(dom_only)}")
@@ -242,46 +442,49 @@ def main():
             return
         
         # Save metadata
-        with open(os.path.join(output_dir, "metadata.json"), "w") as f:
-            json.dump(all_images, f, indent=2, default=str)
+        with open(os.path.join(output_dir, "metadata.json"), "wb") as f:
+            f.write(dump_json(all_images))
         
-        # Download all images
-        print(f"\n📥 Downloading {total} images...")
-        success = 0
-        failed = 0
+        # Skip images an earlier run already finished, unless --force
+        done = {} if args.force else load_manifest(output_dir)
+        statuses = {i: 200 for i, img in enumerate(all_images) if image_key(img) in done}
+        taken = set(done.values())
+        todo = [(i, img, image_filename(img, i, taken))
+                for i, img in enumerate(all_images) if i not in statuses]
+        filenames = {i: fname for i, _, fname in todo}
+        if statuses:
+            print(f"\n⏭️  Skipping {len(statuses)} images already downloaded (use --force to fetch them again)")
         
-        for i, img in enumerate(all_images):
-            url = get_best_url(img)
-            if not url:
-                failed += 1
-                continue
-            
-            prompt = ''
-            if isinstance(img, dict):
-                prompt = img.get('prompt', '') or img.get('alt', '') or ''
-            safe = re.sub(r'[^\w\s-]', '', prompt[:60]).strip().replace(' ', '_') or 'image'
-            fname = f"{i:04d}_{safe}.png"
-            fpath = os.path.join(output_dir, fname)
+        # Download all images in parallel over plain HTTP with the browser's cookies;
+        # the browser sits idle from here on unless Cloudflare refuses a download.
+        # Downloaders only fetch; one writer thread does all the disk writes.
+        cookies = driver.get_cookies()
+        user_agent = driver.execute_script("return navigator.userAgent")
+        writer = DiskWriter(os.path.join(output_dir, MANIFEST_NAME))
+        try:
+            if todo and USE_AIOHTTP:
+                print(f"\n📥 Downloading {len(todo)} images ({ASYNC_CONCURRENCY} at a time, aiohttp)...")
+                statuses.update(asyncio.run(download_all(todo, cookies, user_agent, output_dir, writer)))
+            elif todo:
+                print(f"\n📥 Downloading {len(todo)} images ({DOWNLOAD_WORKERS} at a time)...")
+                statuses.update(download_all_threaded(todo, cookies, user_agent, output_dir, writer))
+            success = sum(1 for status in statuses.values() if status == 200)
+            retry = sorted(i for i, status in statuses.items() if status == 403)
             
-            ok = download_image(driver, url, fpath)
-            if ok:
-                success += 1
-            else:
-                # Try thumbnail URL as fallback
-                thumb = img.get('thumbnail_url') or img.get('url', '') if isinstance(img, dict) else ''
-                if thumb and thumb != url:
-                    ok = download_image(driver, thumb, fpath)
-                    if ok:
+            # Cloudflare may refuse a non-browser client (403); retry those through the browser itself.
+            # The driver isn't thread-safe, so this part runs one image at a time.
+            if retry:
+                print(f"\n🔁 Retrying {len(retry)} images refused with HTTP 403 through the browser...")
+                driver.set_script_timeout(REQUEST_TIMEOUT)
+                fetch = partial(download_image_in_browser, driver, writer)
+                for i in retry:
+                    img = all_images[i]
+                    if download_one(fetch, img, filenames[i], output_dir, defer_403=False) == 200:
+                        writer.record(image_key(img), filenames[i])
                         success += 1
-                    else:
-                        failed += 1
-                else:
-                    failed += 1
-            
-            if (i + 1) % 10 == 0 or (i + 1) == total:
-                print(f"   Progress: {i+1}/{total} ({success} OK, {failed} failed)")
-            
-            time.sleep(0.3)
+        finally:
+            writer.shutdown()
+        failed = total - success
         
         print(f"\n{'='*60}")
         print(f"✅ Done! {success} downloaded, {failed} failed")
@@ -294,82 +497,386 @@ def main():
         driver.quit()
 
 
-def download_image(driver, url, filepath):
-    """Download image using the browser's authenticated session."""
+class DiskWriter:
+    """One background thread that does every file write, fed chunks through a bounded queue."""
+    
+    def __init__(self, manifest_path):
+        self.queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._manifest = open(manifest_path, 'a', buffering=1)
+        self._thread = threading.Thread(target=self._run, name='disk-writer', daemon=True)
+        self._thread.start()
+    
+    def write(self, fpath, data):
+        """Queue a chunk to append to fpath (created/truncated on its first chunk)."""
+        self.queue.put(('write', fpath, data, None))
+    
+    def close(self, fpath, keep=True):
+        """Queue the close of fpath, deleting it unless `keep`; returns a Future set once that's done."""
+        done = Future()
+        self.queue.put(('close', fpath, keep, done))
+        return done
+    
+    def record(self, key, fname):
+        """Queue a manifest line marking image `key` as saved to `fname`."""
+        self.queue.put(('record', key, fname, None))
+    
+    async def write_async(self, fpath, data):
+        """write() for coroutines; only leaves the event loop when the queue is full."""
+        await self._put_async(('write', fpath, data, None))
+    
+    async def close_async(self, fpath, keep=True):
+        """close() for coroutines; waits until the file is closed."""
+        done = Future()
+        await self._put_async(('close', fpath, keep, done))
+        await asyncio.wrap_future(done)
+    
+    async def record_async(self, key, fname):
+        """record() for coroutines."""
+        await self._put_async(('record', key, fname, None))
+    
+    async def _put_async(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self.queue.put, item)
+    
+    def shutdown(self):
+        """Finish the queued writes and stop the thread."""
+        self.queue.put(None)
+        self._thread.join()
+        self._manifest.close()
+    
+    def _run(self):
+        fds = {}
+        failed = {}  # fpath -> OSError from a chunk write, reported at close
+        while (item := self.queue.get()) is not None:
+            op, fpath, payload, done = item
+            if op == 'record':
+                try:
+                    self._manifest.write(json.dumps({'id': fpath, 'file': payload}) + '\n')
+                except OSError as e:
+                    # Only costs a re-download next run; the thread must stay up or the queue jams
+                    print(f"   ⚠️ Couldn't update {MANIFEST_NAME}: {e}")
+                continue
+            if op == 'write':
+                if fpath in failed:
+                    continue
+                try:
+                    fd = fds.get(fpath)
+                    if fd is None:
+                        fd = fds[fpath] = os.open(fpath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                    view = memoryview(payload)
+                    while view:
+                        view = view[os.write(fd, view):]
+                except OSError as e:
+                    failed[fpath] = e
+                continue
+            try:
+                fd = fds.pop(fpath, None)
+                error = failed.pop(fpath, None)
+                if fd is not None:
+                    os.close(fd)
+                    if error or not payload:
+                        os.remove(fpath)  # never leave a partial or rejected file behind
+                if error:
+                    raise error
+                done.set_result(None)
+            except OSError as e:
+                done.set_exception(e)
+
+
+def make_session(cookies, user_agent):
+    """A requests session carrying the browser's cookies and user agent."""
+    session = requests.Session()
+    for c in cookies:
+        session.cookies.set(c['name'], c['value'], domain=c.get('domain'), path=c.get('path', '/'))
+    session.headers.update({
+        'User-Agent': user_agent,
+        'Referer': 'https://ideogram.ai/',
+    })
+    # One pooled connection per worker thread
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=DOWNLOAD_WORKERS)
+    session.mount('https://', adapter)
+    return session
+
+
+def download_all_threaded(todo, cookies, user_agent, output_dir, writer):
+    """Download (index, image, filename) triples over a requests thread pool; returns {index: HTTP status}."""
+    fetch = partial(download_image, make_session(cookies, user_agent), writer)
+    total = len(todo)
+    statuses = {}
+    success = 0
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = {pool.submit(download_one, fetch, img, fname, output_dir): (i, img, fname)
+                   for i, img, fname in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            i, img, fname = futures[future]
+            status = statuses[i] = future.result()
+            if status == 200:
+                writer.record(image_key(img), fname)
+                success += 1
+            if done % 10 == 0 or done == total:
+                print(f"   Progress: {done}/{total} ({success} OK, {done - success} failed)")
+    return statuses
+
+
+async def download_all(todo, cookies, user_agent, output_dir, writer):
+    """Download (index, image, filename) triples concurrently over one aiohttp session; returns {index: HTTP status}."""
+    total = len(todo)
+    statuses = {}
+    progress = {'done': 0, 'success': 0}
+    
+    jar = aiohttp.CookieJar()
+    jar.update_cookies({c['name']: c['value'] for c in cookies}, response_url=URL('https://ideogram.ai'))
+    
+    async def run(i, img, fname):
+        status = statuses[i] = await download_one_async(session, writer, img, fname, output_dir)
+        if status == 200:
+            await writer.record_async(image_key(img), fname)
+        progress['done'] += 1
+        progress['success'] += status == 200
+        done, success = progress['done'], progress['success']
+        if done % 10 == 0 or done == total:
+            print(f"   Progress: {done}/{total} ({success} OK, {done - success} failed)")
+    
+    async with aiohttp.ClientSession(
+        cookie_jar=jar,
+        headers={'User-Agent': user_agent, 'Referer': 'https://ideogram.ai/'},
+        connector=aiohttp.TCPConnector(limit=ASYNC_CONCURRENCY),
+        timeout=aiohttp.ClientTimeout(sock_connect=REQUEST_TIMEOUT, sock_read=REQUEST_TIMEOUT),
+    ) as session:
+        await asyncio.gather(*(run(i, img, fname) for i, img, fname in todo))
+    return statuses
+
+
+def download_one(fetch, img, filename, output_dir, defer_403=True):
+    """Download one image to `filename` with `fetch(url, filepath)`, falling back to its thumbnail; returns the HTTP status.
+
+    With `defer_403` a 403 is returned straight away so the browser retry can fetch the full-res image.
+    """
+    url = get_best_url(img)
+    if not url:
+        return 0
+    
+    fpath = os.path.join(output_dir, filename)
+    
+    status = fetch(url, fpath)
+    if status == 200 or (status == 403 and defer_403):
+        return status
+    # Try thumbnail URL as fallback
+    thumb = img.get('thumbnail_url') or img.get('url', '') if isinstance(img, dict) else ''
+    if thumb and thumb != url:
+        status = fetch(thumb, fpath)
+    return status
+
+
+async def download_one_async(session, writer, img, filename, output_dir):
+    """Async counterpart of download_one over aiohttp; returns the HTTP status."""
+    url = get_best_url(img)
+    if not url:
+        return 0
+    
+    fpath = os.path.join(output_dir, filename)
+    
+    status = await download_image_async(session, writer, url, fpath)
+    # A 403 goes to the browser retry for the full-res image rather than settling for the thumbnail
+    if status in (200, 403):
+        return status
+    # Try thumbnail URL as fallback
+    thumb = img.get('thumbnail_url') or img.get('url', '') if isinstance(img, dict) else ''
+    if thumb and thumb != url:
+        status = await download_image_async(session, writer, thumb, fpath)
+    return status
+
+
+def image_key(img):
+    """Id the manifest records an image under: its response_id, else its download URL."""
+    if isinstance(img, dict):
+        rid = img.get('response_id') or img.get('id')
+        if rid:
+            return rid
+    return get_best_url(img)
+
+
+def image_filename(img, i, taken=()):
+    """Filename for the i-th image, with its id appended if the name is in `taken` (credited to another image)."""
+    name = f"{i:04d}_{safe_name(img)}.png"
+    if name in taken:
+        # A reroll that shifted into an old index would otherwise overwrite that image
+        rid = img.get('response_id') or img.get('id') if isinstance(img, dict) else None
+        name = f"{i:04d}_{safe_name(img)}_{rid or 'new'}.png"
+    return name
+
+
+def safe_name(img):
+    """Filename-safe stem from an image's prompt (or alt text)."""
+    prompt = ''
+    if isinstance(img, dict):
+        prompt = img.get('prompt', '') or img.get('alt', '') or ''
+    return UNSAFE_CHARS_RE.sub('', prompt[:60]).strip().replace(' ', '_') or 'image'
+
+
+def should_retry(status, attempt):
+    """Whether a response is worth another attempt: throttled (429) or a server error, with retries left."""
+    return (status == 429 or status >= 500) and attempt < MAX_RETRIES
+
+
+def retry_delay(retry_after, attempt):
+    """Seconds to wait before retrying: the server's Retry-After if it gave one, else exponential backoff with jitter."""
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = 2 ** attempt + random.random()
+    return min(delay, MAX_BACKOFF)
+
+
+def download_image(session, writer, url, filepath):
+    """Stream an image over HTTP with the browser's cookies to the disk writer; returns the HTTP status (0 if unusable)."""
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as resp:
+                if resp.status_code == 200:
+                    size = 0
+                    complete = False
+                    try:
+                        for chunk in resp.iter_content(CHUNK_SIZE):
+                            writer.write(filepath, chunk)
+                            size += len(chunk)
+                        complete = True
+                    finally:
+                        # Drop tiny/broken files, and partial ones if the connection failed mid-body
+                        done = writer.close(filepath, keep=complete and size > MIN_IMAGE_SIZE)
+                    break
+            # No pause on success; back off only when throttled or the server is struggling
+            if not should_retry(resp.status_code, attempt):
+                return resp.status_code
+            time.sleep(retry_delay(resp.headers.get('retry-after'), attempt))
+        done.result()
+        return 200 if size > MIN_IMAGE_SIZE else 0
+    except (requests.RequestException, OSError):
+        return 0
+
+
+async def download_image_async(session, writer, url, filepath):
+    """Stream an image over aiohttp to the disk writer; returns the HTTP status (0 if unusable)."""
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    size = 0
+                    complete = False
+                    try:
+                        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                            await writer.write_async(filepath, chunk)
+                            size += len(chunk)
+                        complete = True
+                    finally:
+                        # Drop tiny/broken files, and partial ones if the connection failed mid-body
+                        await writer.close_async(filepath, keep=complete and size > MIN_IMAGE_SIZE)
+                    break
+            # No pause on success; back off only when throttled or the server is struggling
+            if not should_retry(resp.status, attempt):
+                return resp.status
+            await asyncio.sleep(retry_delay(resp.headers.get('retry-after'), attempt))
+        return 200 if size > MIN_IMAGE_SIZE else 0
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+        return 0
+
+
+def download_image_in_browser(driver, writer, url, filepath):
+    """Download image using the browser's authenticated session (fallback for 403s); returns the HTTP status."""
     try:
-        driver.execute_script("""
+        # One async round-trip: fetch as a Blob and let the browser's native
+        # FileReader do the base64 encoding, then hand back [status, base64]
+        status, b64data = driver.execute_async_script("""
+            var done = arguments[arguments.length - 1];
             var xhr = new XMLHttpRequest();
-            xhr.open('GET', arguments[0], false);
-            xhr.responseType = 'arraybuffer';
-            xhr.send();
-            window.__dl_status = xhr.status;
-            window.__dl_data = null;
-            if (xhr.status === 200) {
-                var bytes = new Uint8Array(xhr.response);
-                var binary = '';
-                var chunkSize = 8192;
-                for (var j = 0; j < bytes.length; j += chunkSize) {
-                    var chunk = bytes.subarray(j, Math.min(j + chunkSize, bytes.length));
-                    binary += String.fromCharCode.apply(null, chunk);
+            xhr.open('GET', arguments[0]);
+            xhr.responseType = 'blob';
+            xhr.onload = function() {
+                if (xhr.status !== 200) {
+                    done([xhr.status, null]);
+                    return;
                 }
-                window.__dl_data = btoa(binary);
-            }
+                var reader = new FileReader();
+                reader.onload = function() { done([200, reader.result.split(',', 2)[1]]); };
+                reader.onerror = function() { done([0, null]); };
+                reader.readAsDataURL(xhr.response);
+            };
+            xhr.onerror = function() { done([0, null]); };
+            xhr.send();
         """, url)
         
-        status = driver.execute_script("return window.__dl_status")
-        b64data = driver.execute_script("return window.__dl_data")
-        
         if status == 200 and b64data:
             img_bytes = base64.b64decode(b64data)
-            if len(img_bytes) > 1000:  # Skip tiny/broken files
-                with open(filepath, 'wb') as f:
-                    f.write(img_bytes)
-                return True
-        return False
+            if len(img_bytes) > MIN_IMAGE_SIZE:  # Skip tiny/broken files
+                writer.write(filepath, img_bytes)
+                writer.close(filepath).result()
+                return 200
+            return 0
+        return status or 0
     except Exception:
-        return False
+        return 0
 
 
-def find_images_recursive(data, depth=0):
-    """Recursively find image entries in API response data."""
-    if depth > 10:
-        return []
+def add_images(batch, all_images, seen_ids):
+    """Append images from newly captured API responses not seen before; returns how many were new."""
+    before = len(all_images)
+    for resp in batch:
+        for img in find_images_recursive(resp.get('data', {})):
+            rid = img.get('response_id') or img.get('id')
+            if not rid:
+                continue
+            # The same id turns up in many responses; interning makes every copy one shared
+            # string, so the set probe is usually a pointer compare on a cached hash
+            rid = sys.intern(str(rid))
+            if rid not in seen_ids:
+                seen_ids.add(rid)
+                all_images.append(img)
+    return len(all_images) - before
+
+
+def find_images_recursive(data):
+    """Find image entries anywhere in API response data."""
+    # Explicit stack instead of recursion; children are pushed reversed so
+    # results come out in document order. Image dicts found inside a list
+    # are taken as-is, without walking into them.
     results = []
-    if isinstance(data, list):
-        for item in data:
-            if isinstance(item, dict):
-                if 'response_id' in item:
-                    results.append(item)
-                else:
-                    results.extend(find_images_recursive(item, depth + 1))
-            elif isinstance(item, list):
-                results.extend(find_images_recursive(item, depth + 1))
-    elif isinstance(data, dict):
-        if 'response_id' in data:
-            results.append(data)
-        for v in data.values():
-            if isinstance(v, (list, dict)):
-                results.extend(find_images_recursive(v, depth + 1))
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            for item in reversed(node):
+                if isinstance(item, dict) and 'response_id' in item:
+                    stack.append((item,))  # leaf marker: collect, don't descend
+                elif isinstance(item, (list, dict)):
+                    stack.append(item)
+        elif isinstance(node, dict):
+            if 'response_id' in node:
+                results.append(node)
+            stack.extend(v for v in reversed(node.values()) if isinstance(v, (list, dict)))
+        elif isinstance(node, tuple):
+            results.append(node[0])
     return results
 
 
 def get_best_url(img):
     """Get the best (highest res) URL for an image."""
     if isinstance(img, dict):
-        # Prefer direct API endpoint for full res
-        rid = img.get('response_id') or img.get('id')
+        # Prefer direct API endpoint for full res; API records almost always have a response_id
+        rid = img.get('response_id')
+        if not rid:
+            rid = img.get('id')
         if rid:
             return f"https://ideogram.ai/api/images/direct/{rid}"
         
         # Fall back to URL fields
-        for key in ['url', 'image_url', 'src', 'thumbnail_url']:
-            if key in img and img[key]:
-                url = img[key]
-                # Try to upgrade thumbnail to full res
-                if 'thumbnail' in url or '_thumb' in url or 'small' in url:
-                    # Try removing size params
-                    full = re.sub(r'[?&](w|h|width|height|size|quality)=[^&]*', '', url)
-                    return full
+        for key in URL_KEYS:
+            url = img.get(key)
+            if url:
+                # Try to upgrade thumbnail to full res by removing size params
+                if any(tag in url for tag in THUMB_TAGS):
+                    return SIZE_PARAMS_RE.sub('', url)
                 return url
     elif isinstance(img, str):
         return img